@@ -3,19 +3,88 @@ Agent注册机制
 用于管理多个Agent实例，支持通过model name选择不同的Agent
 """
 
-from typing import Dict, Optional, Type, List, Any
-from .BaseAgent import BaseAgent
-from config.config import get_config
+import sys
 import threading
+from collections import defaultdict
+from fastrlock.rlock import FastRLock
+from typing import Dict, Optional, Type, List, Any, KeysView
+from .BaseAgent import BaseAgent
+from config.config import get_config, load_interface_collection, Config
 
 
 class AgentRegistry:
     """Agent注册器，管理多个Agent实例"""
     
-    def __init__(self):
+    def __init__(self, max_pool_size: int = 2):
         self._agents: Dict[str, BaseAgent] = {}
         self._agent_classes: Dict[str, Type[BaseAgent]] = {}
-        self._lock = threading.Lock()
+        # 注册时预先生成的默认名称与描述
+        self._default_names: Dict[str, str] = {}
+        self._default_descs: Dict[str, str] = {}
+        # 注册表操作很少发生竞争，FastRLock 在无竞争时比 threading 锁开销更小
+        self._lock = FastRLock()
+        # 按 model_name 划分的创建锁，不同模型的Agent可以并发创建
+        self._creation_locks: Dict[str, threading.Lock] = {}
+        # 被移除的Agent实例池，按 "类名:model_name" 分组，复用以避免重复构建toolkit和chat
+        self._pool: Dict[str, List[BaseAgent]] = defaultdict(list)
+        self._max_pool_size = max_pool_size
+        # 缓存配置对象，避免每次创建Agent时重复解析配置
+        self._cached_config: Optional[Config] = None
+
+    def _get_config(self) -> Config:
+        """获取（缓存的）配置对象"""
+        if self._cached_config is None:
+            self._cached_config = get_config()
+        return self._cached_config
+
+    def reload_config(self) -> None:
+        """丢弃缓存的配置与模型接口，下次创建Agent时重新加载"""
+        with self._lock:
+            get_config.cache_clear()
+            load_interface_collection.cache_clear()
+            self._cached_config = None
+            # 池中实例持有旧配置下的LLM接口，不能再复用
+            self._pool.clear()
+            BaseAgent._default_llm_interface = None
+            BaseAgent._reply_cache_ttl = None
+            BaseAgent._chat_cache.clear()
+
+    def _get_creation_lock(self, model_name: str) -> threading.Lock:
+        """
+        获取（必要时创建）指定model_name的创建锁
+
+        只为已注册的模型创建锁，请求中任意的未知模型名不会让锁表无限增长。
+
+        Raises:
+            ValueError: 模型未注册
+        """
+        creation_lock = self._creation_locks.get(model_name)
+        if creation_lock is None:
+            with self._lock:
+                if model_name not in self._agent_classes:
+                    raise ValueError(f"Unknown model: {model_name}")
+                creation_lock = self._creation_locks.setdefault(model_name, threading.Lock())
+        return creation_lock
+
+    @staticmethod
+    def _pool_key(agent_class: Type[BaseAgent], model_name: str) -> str:
+        """获取实例池的键名"""
+        return f"{agent_class.__name__}:{model_name}"
+
+    def _release_to_pool(self, model_name: str, agent: BaseAgent) -> None:
+        """
+        将不再使用的Agent实例放回实例池（调用方需持有锁）
+
+        放回池中的实例之后可能被分配给新的调用方，回收后原持有者不得继续使用该实例。
+
+        Args:
+            model_name: 模型名称
+            agent: 要回收的Agent实例
+        """
+        pool = self._pool[self._pool_key(agent.__class__, model_name)]
+        if len(pool) < self._max_pool_size:
+            agent._reset_for_pool()
+            pool.append(agent)
     
     def register_agent_class(self, model_name: str, agent_class: Type[BaseAgent]):
         """
@@ -25,8 +94,12 @@ class AgentRegistry:
             model_name: 模型名称，用于API中的model参数
             agent_class: Agent类（继承自BaseAgent）
         """
+        # 驻留model_name，后续字典查找可直接走指针比较
+        model_name = sys.intern(model_name)
         with self._lock:
             self._agent_classes[model_name] = agent_class
+            self._default_names[model_name] = f"{model_name}-agent"
+            self._default_descs[model_name] = f"Agent instance for {model_name}"
     
     def _create_agent_instance(
         self, 
@@ -55,11 +128,22 @@ class AgentRegistry:
         agent_class = self._agent_classes[model_name]
         
         # 获取配置
-        config = get_config()
+        config = self._get_config()
         
         # 使用默认值或传入的参数
-        agent_name = name or f"{model_name}-agent"
-        agent_description = description or f"Agent instance for {model_name}"
+        agent_name = name or self._default_names[model_name]
+        agent_description = description or self._default_descs[model_name]
+
+        # 没有额外构造参数时优先复用实例池中的Agent；
+        # 池中实例按默认参数构建，传入toolkit、context_file等参数时必须新建
+        if context_file is None and not kwargs:
+            with self._lock:
+                pool = self._pool.get(self._pool_key(agent_class, model_name))
+                pooled_agent = pool.pop() if pool else None
+            if pooled_agent is not None:
+                pooled_agent.name = agent_name
+                pooled_agent.description = agent_description
+                return pooled_agent
         
         # 创建Agent实例
         agent = agent_class(
@@ -89,10 +173,24 @@ class AgentRegistry:
         Returns:
             Agent实例
         """
-        with self._lock:
-            if model_name not in self._agents:
-                self._agents[model_name] = self._create_agent_instance(model_name, **kwargs)
-            return self._agents[model_name]
+        model_name = sys.intern(model_name)
+
+        # 快速路径：实例已存在时无需加锁（dict 读取在 GIL 下是原子的）
+        agent = self._agents.get(model_name)
+        if agent is not None:
+            return agent
+
+        # 只持有该模型的创建锁，构建Agent时不阻塞其他模型
+        with self._get_creation_lock(model_name):
+            # 双重检查：加锁后再次确认，避免重复创建
+            agent = self._agents.get(model_name)
+            if agent is not None:
+                return agent
+
+            agent = self._create_agent_instance(model_name, **kwargs)
+            with self._lock:
+                self._agents[model_name] = agent
+            return agent
     
     def create_agent(
         self, 
@@ -105,16 +203,25 @@ class AgentRegistry:
         
         Args:
             model_name: 模型名称
-            force_new: 是否强制创建新实例（会替换现有实例）
+            force_new: 是否强制创建新实例（会替换现有实例；被替换的实例回收到实例池，调用方不得继续使用）
             **kwargs: 其他参数
             
         Returns:
             Agent实例
         """
-        with self._lock:
-            if force_new or model_name not in self._agents:
-                self._agents[model_name] = self._create_agent_instance(model_name, **kwargs)
-            return self._agents[model_name]
+        model_name = sys.intern(model_name)
+        with self._get_creation_lock(model_name):
+            agent = self._agents.get(model_name)
+            if agent is not None and not force_new:
+                return agent
+
+            new_agent = self._create_agent_instance(model_name, **kwargs)
+            with self._lock:
+                old_agent = self._agents.get(model_name)
+                self._agents[model_name] = new_agent
+                if old_agent is not None:
+                    self._release_to_pool(model_name, old_agent)
+            return new_agent
     
     def get_agent(self, model_name: str) -> Optional[BaseAgent]:
         """
@@ -145,15 +252,41 @@ class AgentRegistry:
             Agent实例的模型名称列表
         """
         return list(self._agents.keys())
+
+    def iter_models(self) -> KeysView[str]:
+        """
+        已注册模型名称的只读视图（不复制）
+
+        视图会随注册表变化，需要在并发修改下稳定遍历时请使用 list_models
+
+        Returns:
+            模型名称视图
+        """
+        return self._agent_classes.keys()
+
+    def iter_agents(self) -> KeysView[str]:
+        """
+        已创建Agent的模型名称只读视图（不复制）
+
+        视图会随注册表变化，需要在并发修改下稳定遍历时请使用 list_agents
+
+        Returns:
+            模型名称视图
+        """
+        return self._agents.keys()
     
     def clear_agents(self):
-        """清空所有Agent实例"""
+        """清空所有Agent实例（实例回收到实例池，之前取得的实例不得继续使用）"""
         with self._lock:
+            for model_name, agent in self._agents.items():
+                self._release_to_pool(model_name, agent)
             self._agents.clear()
     
     def remove_agent(self, model_name: str) -> bool:
         """
         移除Agent实例
+
+        被移除的实例回收到实例池并可能被再次分配，之前取得该实例的调用方不得继续使用。
         
         Args:
             model_name: 模型名称
@@ -163,7 +296,7 @@ class AgentRegistry:
         """
         with self._lock:
             if model_name in self._agents:
-                del self._agents[model_name]
+                self._release_to_pool(model_name, self._agents.pop(model_name))
                 return True
             return False
     
@@ -199,7 +332,7 @@ class AgentRegistry:
         """
         result = {}
         with self._lock:
-            for model_name in self._agents:
+            for model_name in self.iter_agents():
                 info = self.get_agent_info(model_name)
                 if info:
                     result[model_name] = info
@@ -228,8 +361,9 @@ class AgentRegistry:
             return {
                 "registered_models": len(self._agent_classes),
                 "active_agents": len(self._agents),
-                "registered_model_list": list(self._agent_classes.keys()),
-                "active_agent_list": list(self._agents.keys())
+                "registered_model_list": list(self._agent_classes),
+                "active_agent_list": list(self._agents),
+                "pooled_agents": sum(len(pool) for pool in self._pool.values()),
             }
 
 
@@ -264,6 +398,11 @@ def get_agent(model_name: str, **kwargs) -> BaseAgent:
     Returns:
         Agent实例
     """
+    # 命中已有实例时直接返回，不经过 **kwargs 转发
+    if not kwargs:
+        existing = _global_registry.get_agent(model_name)
+        if existing is not None:
+            return existing
     return _global_registry.get_or_create_agent(model_name, **kwargs)
 
 
@@ -14,6 +14,7 @@ from typing import (
     Optional,
     Callable,
     Generator,
+    Iterable,
     Sequence,
     Tuple,
     AsyncGenerator,
@@ -22,11 +23,29 @@ from typing import (
 from abc import ABC, abstractmethod
 from SimpleLLMFunc import llm_chat, OpenAICompatible # type: ignore
 import threading
-from context.conversation_manager import get_current_context, get_current_sketch_pad
+from collections import OrderedDict
+from fastrlock.rlock import FastRLock
+from context.conversation_manager import (
+    get_current_conversation,
+    get_current_context,
+    get_current_sketch_pad,
+)
+from context.context import ContextBackend, summary_digest
+from context.sketch_pad import SketchPadBackend
 from context.schemas import Message
-import json
+import asyncio
+import io
+import orjson
 import os
+import sys
+import textwrap
+import time
+import types
 import uuid
+import weakref
+
+# _iterate_in_thread 中生产线程投递给事件循环的消息类型
+_STREAM_ITEM, _STREAM_ERROR, _STREAM_END = range(3)
 
 
 class BaseAgent(ABC):
@@ -36,9 +55,53 @@ class BaseAgent(ABC):
     所有具体的Agent实现都应该继承此类并实现抽象方法
     """
 
+    # 固定的实例属性，使用 __slots__ 省去实例 __dict__；子类应同样声明 __slots__
+    __slots__ = (
+        "name",
+        "description",
+        "model_name",
+        "llm_interface",
+        "_toolkit",
+        "_chat",
+        "_session_info_cache",
+        "_sketch_summary_cache",
+        "_reply_cache",
+        "__weakref__",
+    )
+
+    # get_session_info 缓存的有效期（秒）；内容版本未变化时可复用更久（访问计数等统计可能滞后）
+    _session_info_ttl: float = 1.0
+    _session_info_max_age: float = 30.0
+
+    # 重复查询的回复缓存：有效期（秒，None表示尚未读取配置 AGENT_REPLY_CACHE_TTL，<=0 表示关闭）、
+    # 最大条目数、单条回复最多缓存的数据包数
+    _reply_cache_ttl: Optional[float] = None
+    _reply_cache_size: int = 16
+    _reply_cache_max_chunks: int = 4096
+
     # 类级别的实例缓存，确保每个Agent子类的单例
-    _class_instances: Dict[str, "BaseAgent"] = {}
-    _class_lock = threading.Lock()
+    # 只持有弱引用：没有外部引用的实例会被回收，下次 get_instance 时重新创建
+    _class_instances: "weakref.WeakValueDictionary[str, BaseAgent]" = weakref.WeakValueDictionary()
+    # 低竞争场景下 FastRLock 的加锁开销比 threading 锁更小
+    _class_lock = FastRLock()
+    # 缓存的默认LLM接口，避免每次创建实例时重复解析配置
+    _default_llm_interface: Optional[OpenAICompatible] = None
+    # 经 llm_chat 装饰后的对话函数，同类、同LLM接口、同工具集的实例共享
+    # 键为 (Agent类, id(llm_interface), 各工具的id)；值中同时持有接口与工具集，保证id不被复用
+    _chat_cache: Dict[Tuple[type, int, Tuple[int, ...]], Tuple[Any, Sequence[Callable], Callable]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        子类创建时一次性规整 chat_impl 的提示词（去除公共缩进并驻留）
+
+        保证发送给服务端的静态前缀逐字节稳定，不随Python版本对docstring缩进的处理而变化，
+        llm_chat 每次读取 __doc__ 时也无需再处理缩进。
+        """
+        super().__init_subclass__(**kwargs)
+        impl = cls.__dict__.get("chat_impl")
+        doc = getattr(impl, "__doc__", None)
+        if doc:
+            impl.__doc__ = sys.intern(textwrap.dedent(doc))
 
     @classmethod
     def get_instance(
@@ -52,6 +115,9 @@ class BaseAgent(ABC):
         """
         获取Agent实例的类方法（单例模式）
 
+        实例缓存只持有弱引用，调用方需要自行保留返回的实例；
+        若实例已被回收，再次调用会创建新的实例。
+
         Args:
             model_name: 模型名称
             name: Agent名称
@@ -62,30 +128,54 @@ class BaseAgent(ABC):
         Returns:
             Agent实例
         """
-        with cls._class_lock:
-            # 使用类名和model_name作为唯一标识
-            instance_key = f"{cls.__name__}:{model_name}"
+        # 使用类名和model_name作为唯一标识
+        instance_key = sys.intern(f"{cls.__name__}:{model_name}")
 
-            if instance_key not in cls._class_instances:
+        # 快速路径：实例已存在时无需加锁
+        instance = cls._class_instances.get(instance_key)
+        if instance is not None:
+            return instance
+
+        with cls._class_lock:
+            # 双重检查：加锁后再次确认，避免重复创建
+            instance = cls._class_instances.get(instance_key)
+            if instance is None:
                 if not llm_interface:
                     # 如果没有提供llm_interface，尝试从配置获取
-                    from config.config import get_config
-
-                    config = get_config()
-                    llm_interface = config.BASIC_INTERFACE
+                    llm_interface = cls._get_default_llm_interface()
 
                 instance_name = name or f"{model_name}-agent"
                 instance_description = description or f"Agent instance for {model_name}"
 
-                cls._class_instances[instance_key] = cls(
+                # 先用局部变量持有强引用，避免写入弱引用字典后立即被回收
+                instance = cls(
                     name=instance_name,
                     description=instance_description,
                     llm_interface=llm_interface,
                     model_name=model_name,
                     **kwargs,
                 )
+                cls._class_instances[instance_key] = instance
+
+            return instance
+
+    @classmethod
+    def _get_default_llm_interface(cls) -> OpenAICompatible:
+        """获取默认的LLM接口（首次解析后缓存在BaseAgent上）"""
+        if BaseAgent._default_llm_interface is None:
+            from config.config import get_config
+
+            BaseAgent._default_llm_interface = get_config().BASIC_INTERFACE
+        return BaseAgent._default_llm_interface
 
-            return cls._class_instances[instance_key]
+    @classmethod
+    def _get_reply_cache_ttl(cls) -> float:
+        """获取回复缓存的有效期（首次读取配置后缓存在BaseAgent上），<=0 表示关闭"""
+        if BaseAgent._reply_cache_ttl is None:
+            from config.config import get_config
+
+            BaseAgent._reply_cache_ttl = get_config().AGENT_REPLY_CACHE_TTL
+        return BaseAgent._reply_cache_ttl
 
     @classmethod
     def clear_instances(cls):
@@ -95,8 +185,8 @@ class BaseAgent(ABC):
 
     @classmethod
     def get_all_instances(cls) -> Dict[str, "BaseAgent"]:
-        """获取所有实例"""
-        return cls._class_instances.copy()
+        """获取所有实例（仍存活实例的快照）"""
+        return dict(cls._class_instances)
 
     def __init__(
         self,
@@ -111,22 +201,76 @@ class BaseAgent(ABC):
         self.model_name = model_name  # 存储model_name
         self.llm_interface = llm_interface
 
+        # get_session_info 的缓存：(时间戳, 所属Context, (Context版本, SketchPad版本), 会话信息)
+        self._session_info_cache: Optional[
+            Tuple[float, Any, Tuple[Optional[int], Optional[int]], Dict[str, Any]]
+        ] = None
+        # SketchPad 摘要缓存：(所属SketchPad, 内容版本号, 摘要文本)
+        self._sketch_summary_cache: Optional[Tuple[Any, int, str]] = None
+
         if not self.llm_interface:
             raise ValueError("llm_interface must be provided")
 
-        # 子类需要定义自己的工具集
-        self.toolkit = self.get_toolkit()
+        # 工具集与chat函数在首次访问时才构建，未被使用的实例无需付出构建代价
+        self._toolkit: Optional[Tuple[Callable, ...]] = None
+        self._chat: Optional[Callable] = None
 
-        # 初始化chat函数
-        self.chat = llm_chat(
-            llm_interface=self.llm_interface,
-            toolkit=self.toolkit,  # type: ignore
-            stream=True,
-            return_mode="raw",
-            max_tool_calls=2000,
-            timeout=600,
-            temperature=1.0,
-        )(self.chat_impl)
+        # 回复缓存：(查询, Context, Context版本, SketchPad, SketchPad版本) -> (时间戳, 原始数据包列表)
+        self._reply_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, List[Any], str]]" = OrderedDict()
+
+    @property
+    def toolkit(self) -> Tuple[Callable, ...]:
+        """Agent的工具集（首次访问时通过 get_toolkit 构建）"""
+        if self._toolkit is None:
+            # 子类需要定义自己的工具集；构建时冻结为元组，之后不会被调用方意外修改
+            self._toolkit = tuple(self.get_toolkit())
+        return self._toolkit
+
+    @property
+    def chat(self) -> Callable:
+        """
+        经 llm_chat 装饰的对话函数（首次访问时构建）
+
+        装饰结果在类级别缓存，同类、同LLM接口、同工具集的实例复用同一个对话函数。
+        chat_impl 只承载提示词与签名，会被绑定到类而非实例上，因此不应依赖实例状态。
+        """
+        if self._chat is None:
+            cls = type(self)
+            toolkit = self.toolkit
+            key = (cls, id(self.llm_interface), tuple(map(id, toolkit)))
+            cached = BaseAgent._chat_cache.get(key)
+            if cached is None:
+                with BaseAgent._class_lock:
+                    cached = BaseAgent._chat_cache.get(key)
+                    if cached is None:
+                        chat = llm_chat(
+                            llm_interface=self.llm_interface,
+                            toolkit=list(toolkit),  # type: ignore
+                            stream=True,
+                            return_mode="raw",
+                            max_tool_calls=2000,
+                            timeout=600,
+                            temperature=1.0,
+                        )(types.MethodType(cls.chat_impl, cls))
+                        cached = (self.llm_interface, toolkit, chat)
+                        BaseAgent._chat_cache[key] = cached
+            self._chat = cached[2]
+        return self._chat
+
+    def _reset_for_pool(self) -> None:
+        """
+        回收到实例池前重置会话相关的内存状态
+
+        toolkit、chat、llm_interface 等构建代价较高的属性会被保留，
+        子类如果持有额外的会话状态，应重写此方法并调用父类实现。
+        """
+        self._session_info_cache = None
+        self._sketch_summary_cache = None
+        self._reply_cache.clear()
+
+    def _invalidate_session_info(self) -> None:
+        """使 get_session_info 的缓存失效"""
+        self._session_info_cache = None
 
     @abstractmethod
     def get_toolkit(self) -> Sequence[Callable]:
@@ -145,17 +289,16 @@ class BaseAgent(ABC):
         self,
         history: List[Dict[str, str]],
         query: str,
-        sketch_pad_summary: str,
     ) -> Generator[Tuple[str, List[Dict[str, str]]], None, None]:
         """
         Agent的对话实现逻辑（抽象方法）
 
-        子类必须实现此方法来定义具体的对话行为
+        子类必须实现此方法来定义具体的对话行为。docstring 作为系统提示词，
+        应保持静态；SketchPad摘要等每轮变化的内容通过 build_runtime_message 放入history末尾。
 
         Args:
             history: 对话历史
             query: 用户查询
-            sketch_pad_summary: SketchPad摘要
 
         Returns:
             Generator yielding (response_chunk, updated_history)
@@ -176,124 +319,242 @@ class BaseAgent(ABC):
         pass
 
     # 通用辅助方法
+    @staticmethod
+    def build_runtime_message(sketch_pad_summary: str) -> Dict[str, str]:
+        """
+        构建承载每轮运行时信息的system消息
+
+        该消息追加在history末尾，使系统提示词与历史消息构成的前缀在各轮之间保持不变，
+        从而可以命中服务端的prompt缓存。
+
+        Args:
+            sketch_pad_summary: SketchPad摘要
+
+        Returns:
+            Dict[str, str]: system角色的消息
+        """
+        return {"role": "system", "content": f"[runtime]\nsketch_pad:\n{sketch_pad_summary}"}
+
+    @staticmethod
+    def build_summary_message(summary: str) -> Dict[str, str]:
+        """
+        构建承载历史对话摘要的system消息
+
+        该消息放在history开头，内容只由摘要文本决定（不含时间戳），并带有摘要的版本号；
+        摘要不变时消息逐字节一致，与之后的历史消息一起构成可缓存的前缀。
+
+        Args:
+            summary: 对话摘要
+
+        Returns:
+            Dict[str, str]: system角色的消息
+        """
+        return {
+            "role": "system",
+            "content": f"[conversation_summary v={summary_digest(summary)}]\n{summary}",
+        }
+
     def get_sketch_pad_summary(self) -> str:
         """获取SketchPad的摘要信息，包括所有keys和截断的values"""
         try:
             sketch_pad = get_current_sketch_pad()
             if sketch_pad is None:
                 return "SketchPad不可用：没有活动的conversation上下文"
-            
-            # 获取所有项目的详细信息（包含值）
-            all_items = sketch_pad.list_items(include_value=True)
-
-            if not all_items:
-                return "SketchPad为空：无存储内容"
-
-            summary_lines = [f"SketchPad当前状态 (共{len(all_items)}个项目):"]
-
-            for item in all_items[:20]:  # 限制显示前20个项目
-                key = item.key
-                tags = ", ".join(item.tags) if item.tags else "无标签"
-                timestamp = item.timestamp
-                content_type = item.content_type
-
-                # 使用列表项中包含的值进行预览
-                value_obj = item.value
-                value_str = str(value_obj) if value_obj is not None else ""
-                if len(value_str) > 100:
-                    value_preview = value_str[:100] + "..."
-                else:
-                    value_preview = value_str
-
-                value_preview = value_preview.replace("\n", "\\n")
-
-                summary_lines.append(
-                    f"  • {key}: [{content_type}] {value_preview} "
-                    f"(标签: {tags}, 时间: {timestamp[:19]})"
-                )
-
-            if len(all_items) > 20:
-                summary_lines.append(f"  ... 还有 {len(all_items) - 20} 个项目未显示")
 
-            return "\n".join(summary_lines)
+            # SketchPad 内容未变化时直接复用上次生成的摘要
+            version = sketch_pad.version
+            cached = self._sketch_summary_cache
+            if (
+                version is not None
+                and cached is not None
+                and cached[0] is sketch_pad
+                and cached[1] == version
+            ):
+                return cached[2]
+
+            summary = self._build_sketch_pad_summary(sketch_pad)
+            if version is not None:
+                self._sketch_summary_cache = (sketch_pad, version, summary)
+            return summary
 
         except Exception as e:
             return f"获取SketchPad摘要时出错: {str(e)}"
 
-    # 上下文管理的便捷方法
-    def get_conversation_history(self, limit: Optional[int] = None):
-        """获取当前会话的对话历史"""
+    def _build_sketch_pad_summary(self, sketch_pad: SketchPadBackend) -> str:
+        """根据SketchPad当前内容生成摘要文本"""
+        total = sketch_pad.count_items()
+        if not total:
+            return "SketchPad为空：无存储内容"
+
+        # 只列出需要展示的前20个项目；列表只读取存储的JSON，不回写访问统计，预览在写入时已生成
+        shown_items = sketch_pad.list_items(include_value=False, limit=20)
+
+        buf = io.StringIO()
+        w = buf.write
+        w(f"SketchPad当前状态 (共{total}个项目):")
+
+        for item in shown_items:
+            tags = ", ".join(item.tags) if item.tags else "无标签"
+            w(
+                f"\n  • {item.key}: [{item.content_type}] {item.preview} "
+                f"(标签: {tags}, 时间: {item.timestamp[:19]})"
+            )
+
+        if total > 20:
+            w(f"\n  ... 还有 {total - 20} 个项目未显示")
+
+        return buf.getvalue()
+
+    # ===== 重复查询的回复缓存 =====
+    @staticmethod
+    def _reply_cache_key(query: str) -> Optional[Tuple[Any, ...]]:
+        """
+        根据查询与当前会话状态生成回复缓存键
+
+        Context 或 SketchPad 不跟踪版本时返回None，表示不可缓存。
+        """
+        conversation = get_current_conversation()
+        if conversation is None:
+            return None
+        context = conversation.context
+        sketch_pad = conversation.sketch_pad
+        context_version = context.version
+        sketch_version = sketch_pad.version
+        if context_version is None or sketch_version is None:
+            return None
+        return (query, context, context_version, sketch_pad, sketch_version)
+
+    def get_cached_reply(self, query: str) -> Optional[Tuple[List[Any], str]]:
+        """
+        获取同一会话状态下相同查询的缓存回复
+
+        缓存在一次完整回复结束后按结束时的会话状态记录，因此只有在会话未发生任何变化时
+        （如用户重试同一问题）才会命中。命中后调用方仍需把本轮的用户消息与回复文本写入上下文。
+        配置 AGENT_REPLY_CACHE_TTL<=0 时缓存关闭，始终返回None。
+
+        Args:
+            query: 用户查询
+
+        Returns:
+            (缓存的原始数据包列表, 回复文本)，未命中时返回None
+        """
+        ttl = self._get_reply_cache_ttl()
+        if ttl <= 0:
+            return None
+        key = self._reply_cache_key(query)
+        if key is None:
+            return None
+        entry = self._reply_cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > ttl:
+            self._reply_cache.pop(key, None)
+            return None
+        try:
+            self._reply_cache.move_to_end(key)
+        except KeyError:
+            pass
+        return entry[1], entry[2]
+
+    def cache_reply(self, query: str, chunks: List[Any]) -> None:
+        """
+        按当前（回复结束后的）会话状态记录一次完整回复
+
+        包含工具调用的回复不会被记录：重放时工具不会真正执行，旧的工具结果会被当作新结果展示。
+
+        Args:
+            query: 用户查询
+            chunks: 本次回复的全部原始数据包
+        """
+        if self._get_reply_cache_ttl() <= 0 or any(map(self._chunk_has_tool_calls, chunks)):
+            return
+        key = self._reply_cache_key(query)
+        if key is None:
+            return
+        reply_text = "".join(map(self._extract_text_from_chunk, chunks))
+        cache = self._reply_cache
+        cache[key] = (time.monotonic(), chunks, reply_text)
+        cache.move_to_end(key)
+        while len(cache) > self._reply_cache_size:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                break
+
+    @staticmethod
+    def _require_context() -> ContextBackend:
+        """获取当前会话的Context，不存在时抛出RuntimeError"""
         context = get_current_context()
         if context is None:
             raise RuntimeError("No active conversation context")
+        return context
+
+    @staticmethod
+    def _require_sketch_pad() -> SketchPadBackend:
+        """获取当前会话的SketchPad，不存在时抛出RuntimeError"""
+        sketch_pad = get_current_sketch_pad()
+        if sketch_pad is None:
+            raise RuntimeError("No active conversation context")
+        return sketch_pad
+
+    # 上下文管理的便捷方法
+    def get_conversation_history(self, limit: Optional[int] = None):
+        """获取当前会话的对话历史"""
+        context = self._require_context()
         return context.retrieve_messages(limit)
 
     def get_full_saved_history(self, limit: Optional[int] = None):
         """获取完整保存的对话历史"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         return context.retrieve_messages(limit)
 
     def search_conversation(self, query: str, limit: int = 5):
         """搜索当前会话的对话历史"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         # 使用简单的搜索实现
         return context.search_messages(query, limit)
 
     def search_full_history(self, query: str, limit: int = 5):
         """搜索完整保存的对话历史"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         return context.search_messages(query, limit)
 
     def clear_conversation(self) -> None:
         """清空当前会话的对话历史"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         context.clear_messages(keep_summary=True)
+        self._invalidate_session_info()
 
     def get_conversation_summary(self) -> str:
         """获取当前会话的对话摘要"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         return context.get_summary() or ""
 
     def get_full_saved_summary(self) -> str:
         """获取完整保存的对话摘要"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         return context.get_summary() or ""
 
     def export_conversation(self, file_path: str) -> None:
         """导出当前会话的对话记录"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
         data = context.serialize()
         dir_path = os.path.dirname(file_path)
         if dir_path:
             os.makedirs(dir_path, exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(file_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
 
     def import_conversation(self, file_path: str, merge: bool = False) -> None:
         """导入对话记录"""
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        context = self._require_context()
+        with open(file_path, "rb") as f:
+            data = orjson.loads(f.read())
         if not merge:
             # 清空现有消息但保留摘要
             context.clear_messages(keep_summary=True)
         context.deserialize(data)
+        self._invalidate_session_info()
 
     # SketchPad 管理的便捷方法
     async def store_in_sketch_pad(
@@ -304,9 +565,7 @@ class BaseAgent(ABC):
         ttl: Optional[int] = None,
     ) -> str:
         """存储数据到 SketchPad"""
-        sketch_pad = get_current_sketch_pad()
-        if sketch_pad is None:
-            raise RuntimeError("No active conversation context")
+        sketch_pad = self._require_sketch_pad()
         # 生成键名（若未提供）
         item_key = key or f"item_{uuid.uuid4().hex[:8]}"
         # tags 转换为 set
@@ -318,49 +577,63 @@ class BaseAgent(ABC):
             summary=None,
             tags=tags_set,
         )
+        self._invalidate_session_info()
         return item_key
 
     def get_from_sketch_pad(self, key: str) -> Any:
         """从 SketchPad 获取数据"""
-        sketch_pad = get_current_sketch_pad()
-        if sketch_pad is None:
-            raise RuntimeError("No active conversation context")
+        sketch_pad = self._require_sketch_pad()
         return sketch_pad.get_value(key)
 
     def search_sketch_pad(self, query: str, limit: int = 5):
         """搜索 SketchPad 内容"""
-        sketch_pad = get_current_sketch_pad()
-        if sketch_pad is None:
-            raise RuntimeError("No active conversation context")
+        sketch_pad = self._require_sketch_pad()
         return sketch_pad.search_by_content(query, limit)
 
     def get_sketch_pad_stats(self):
         """获取 SketchPad 统计信息"""
-        sketch_pad = get_current_sketch_pad()
-        if sketch_pad is None:
-            raise RuntimeError("No active conversation context")
+        sketch_pad = self._require_sketch_pad()
         return sketch_pad.get_statistics()
 
     def clear_sketch_pad(self):
         """清空 SketchPad"""
-        sketch_pad = get_current_sketch_pad()
-        if sketch_pad is None:
-            raise RuntimeError("No active conversation context")
+        sketch_pad = self._require_sketch_pad()
         sketch_pad.clear()
+        self._invalidate_session_info()
 
     def get_session_info(self):
         """获取会话信息（包括对话历史和 SketchPad 统计）"""
-        try:
-            conversation_count = len(self.get_conversation_history())
-            sketch_pad_stats = self.get_sketch_pad_stats()
-            conversation_summary = self.get_conversation_summary()
-        except RuntimeError:
+        # 只解析一次当前会话，Context 与 SketchPad 均从中获取
+        conversation = get_current_conversation()
+        current_context = conversation.context if conversation else None
+
+        if conversation is not None:
+            versions = (current_context.version, conversation.sketch_pad.version)
+        else:
+            versions = (None, None)
+
+        # Context 与 SketchPad 均未变化时复用缓存；后端不跟踪版本时只在短时间内复用
+        cached = self._session_info_cache
+        if cached is not None and cached[1] is current_context:
+            age = time.monotonic() - cached[0]
+            if None not in versions and cached[2] == versions:
+                if age < self._session_info_max_age:
+                    return dict(cached[3])
+            elif age < self._session_info_ttl:
+                return dict(cached[3])
+
+        if conversation is not None:
+            # 直接读取消息条数，无需反序列化整个历史
+            conversation_count = current_context.get_message_count()
+            sketch_pad_stats = conversation.sketch_pad.get_statistics()
+            conversation_summary = current_context.get_summary() or ""
+        else:
             # 如果没有活动的conversation上下文，返回基本信息
             conversation_count = 0
             sketch_pad_stats = {}
             conversation_summary = None
-            
-        return {
+
+        session_info = {
             "agent_name": self.name,
             "model_name": self.model_name,
             "agent_class": self.__class__.__name__,
@@ -368,95 +641,182 @@ class BaseAgent(ABC):
             "sketch_pad_stats": sketch_pad_stats,
             "conversation_summary": conversation_summary,
         }
+        self._session_info_cache = (time.monotonic(), current_context, versions, session_info)
+        return dict(session_info)
 
     # ===== 通用：流式输出与按时序持久化 =====
     def _extract_text_from_chunk(self, chunk: Any) -> str:
         """从原始流式增量中提取纯文本内容（若存在）。"""
+        # 绝大多数增量都带有完整的属性链，直接访问并在缺失时兜底
         try:
-            if not hasattr(chunk, "choices") or not chunk.choices:
-                return ""
-            choice = chunk.choices[0]
-            delta = getattr(choice, "delta", None)
-            if delta is None:
-                return ""
-            content = getattr(delta, "content", None)
-            return content or ""
-        except Exception:
+            return chunk.choices[0].delta.content or ""
+        except (AttributeError, IndexError, TypeError):
             return ""
 
-    def _msg_to_dict(self, msg: Any) -> Dict[str, Any]:
-        """将后端返回的消息统一转为字典结构，兼容对象与字典两种形态。"""
-        if isinstance(msg, dict):
-            return msg
-        return {
-            "role": getattr(msg, "role", None),
-            "content": getattr(msg, "content", None),
-            "tool_calls": getattr(msg, "tool_calls", None),
-            "tool_call_id": getattr(msg, "tool_call_id", None),
-        }
+    def _chunk_has_tool_calls(self, chunk: Any) -> bool:
+        """原始流式增量中是否带有工具调用。"""
+        try:
+            return bool(chunk.choices[0].delta.tool_calls)
+        except (AttributeError, IndexError, TypeError):
+            return False
+
+    @staticmethod
+    async def _iterate_in_thread(
+        iterable: Iterable[Any], maxsize: int = 32
+    ) -> AsyncGenerator[Any, None]:
+        """
+        在后台线程中迭代同步可迭代对象，并以异步生成器的形式产出其元素
+
+        生产线程最多领先消费方maxsize个元素；消费方提前退出时，生产线程会在下一个元素后停止
+        并关闭源生成器。源中抛出的异常会在消费方重新抛出。
+
+        Args:
+            iterable: 同步可迭代对象（如llm_chat返回的流式生成器）
+            maxsize: 生产线程可领先的最大元素数
+
+        Yields:
+            源中的元素
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        slots = threading.Semaphore(maxsize)
+        stopped = threading.Event()
+
+        def _put(kind: int, payload: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, (kind, payload))
+            except RuntimeError:
+                # 事件循环已关闭，消费方不再存在
+                stopped.set()
+
+        def _produce() -> None:
+            try:
+                for item in iterable:
+                    slots.acquire()
+                    if stopped.is_set():
+                        break
+                    _put(_STREAM_ITEM, item)
+            except BaseException as e:
+                _put(_STREAM_ERROR, e)
+                return
+            finally:
+                if stopped.is_set():
+                    close = getattr(iterable, "close", None)
+                    if close is not None:
+                        close()
+            _put(_STREAM_END, None)
+
+        threading.Thread(target=_produce, name="agent-stream", daemon=True).start()
+        try:
+            while True:
+                kind, payload = await queue.get()
+                if kind == _STREAM_END:
+                    return
+                if kind == _STREAM_ERROR:
+                    raise payload
+                slots.release()
+                yield payload
+        finally:
+            stopped.set()
+            # 唤醒可能阻塞在背压上的生产线程
+            slots.release()
+
+    @staticmethod
+    async def _prepend_async(
+        first: Any, rest: AsyncGenerator[Any, None]
+    ) -> AsyncGenerator[Any, None]:
+        """先产出first，再依次产出rest中的元素；结束或提前退出时关闭rest"""
+        try:
+            yield first
+            async for item in rest:
+                yield item
+        finally:
+            await rest.aclose()
 
     async def _stream_and_persist(
-        self, response_packages: Generator[Tuple[Any, List[Any]], None, None]
+        self, response_packages: Iterable[Tuple[Any, List[Any]]]
     ) -> AsyncGenerator[Any, None]:
         """
         统一的流式处理与历史持久化逻辑：
         - 连续累积助手文本；遇到 tooluse/tool 结果时先落盘已累积文本，再写工具消息；
         - 确保历史中工具调用出现在其触发时刻之后，顺序正确。
         """
-        context = get_current_context()
-        if context is None:
-            raise RuntimeError("No active conversation context")
+        context = self._require_context()
 
-        assistant_buffer: str = ""
-        baseline_len: Optional[int] = None
+        # 以列表累积助手文本片段，落盘时再一次性拼接
+        assistant_parts: List[str] = []
+        # 每个流式增量都会执行下面的循环，热路径上用到的方法预先绑定为局部变量
+        append_part = assistant_parts.append
+        extract_text = self._extract_text_from_chunk
+        _Message = Message
 
-        for raw_response, current_messages in response_packages:
-            if baseline_len is None:
-                try:
-                    baseline_len = len(current_messages) if isinstance(current_messages, list) else 0
-                except Exception:
-                    baseline_len = 0
+        # 同步的LLM流在后台线程中迭代，等待网络数据时不阻塞事件循环
+        packages = self._iterate_in_thread(response_packages)
 
+        # 用首个数据包确定历史基线长度，避免在循环中逐个增量判断
+        try:
+            first_package = await anext(packages)
+        except StopAsyncIteration:
+            return
+        first_messages = first_package[1]
+        baseline_len: int = len(first_messages) if isinstance(first_messages, list) else 0
+
+        async for raw_response, current_messages in self._prepend_async(first_package, packages):
             # 直接把原始增量向上游转发
             yield raw_response
 
             # 累积文本
-            delta_text = self._extract_text_from_chunk(raw_response)
+            delta_text = extract_text(raw_response)
             if delta_text:
-                assistant_buffer += delta_text
+                append_part(delta_text)
 
             # 检查新产生的消息（含工具调用/工具结果）并按时序写入
-            try:
-                if isinstance(current_messages, list):
-                    curr_len = len(current_messages)
-                    if baseline_len is not None and curr_len > baseline_len:
-                        new_msgs = current_messages[baseline_len:curr_len]
-                        for nm in (self._msg_to_dict(x) for x in new_msgs):
-                            role = nm.get("role")
-                            content = nm.get("content")
-                            tool_calls = nm.get("tool_calls")
-                            tool_call_id = nm.get("tool_call_id")
-
-                            # 工具相关出现前，先落盘已累积的助手文本
-                            if (role == "assistant" and tool_calls) or role == "tool":
-                                if assistant_buffer.strip():
-                                    await context.store_message(
-                                        Message(role="assistant", content=assistant_buffer)
-                                    )
-                                    assistant_buffer = ""
-
-                            if role == "assistant" and tool_calls:
-                                await context.store_message(
-                                    Message(role="assistant", content=None, tool_calls=tool_calls)
-                                )
-                            elif role == "tool":
-                                await context.store_message(
-                                    Message(role="tool", content=content, tool_call_id=tool_call_id)
-                                )
-                        baseline_len = curr_len
-            except Exception:
-                pass
+            if not isinstance(current_messages, list):
+                continue
+            curr_len = len(current_messages)
+            if curr_len <= baseline_len:
+                continue
+
+            # 按下标遍历新增消息，避免每个增量都切片出新列表
+            for i in range(baseline_len, curr_len):
+                # 只有字段读取与消息构造可能失败，格式异常的消息直接跳过
+                try:
+                    # 直接按类型读取字段，避免为每条消息构造中间字典
+                    msg = current_messages[i]
+                    if isinstance(msg, dict):
+                        role = msg.get("role")
+                        tool_calls = msg.get("tool_calls")
+                    else:
+                        role = getattr(msg, "role", None)
+                        tool_calls = getattr(msg, "tool_calls", None)
+
+                    if role == "assistant" and tool_calls:
+                        message = _Message(role="assistant", content=None, tool_calls=tool_calls)
+                    elif role == "tool":
+                        if isinstance(msg, dict):
+                            content = msg.get("content")
+                            tool_call_id = msg.get("tool_call_id")
+                        else:
+                            content = getattr(msg, "content", None)
+                            tool_call_id = getattr(msg, "tool_call_id", None)
+                        message = _Message(role="tool", content=content, tool_call_id=tool_call_id)
+                    else:
+                        continue
+                except (AttributeError, TypeError, KeyError, IndexError, ValueError):
+                    continue
+
+                # 工具相关出现前，先落盘已累积的助手文本
+                if any(part.strip() for part in assistant_parts):
+                    await context.store_message(
+                        _Message(role="assistant", content="".join(assistant_parts))
+                    )
+                    assistant_parts.clear()
+
+                # 工具调用与工具结果逐条依次写入，保证持久化历史与各项缓存的顺序确定
+                await context.store_message(message)
+
+            baseline_len = curr_len
 
         # 流结束，写入残留的助手文本
-        if assistant_buffer.strip():
-            await context.store_message(Message(role="assistant", content=assistant_buffer))
+        if any(part.strip() for part in assistant_parts):
+            await context.store_message(_Message(role="assistant", content="".join(assistant_parts)))
@@ -1,175 +1,178 @@
-from typing import Dict, List, Generator, Tuple, AsyncGenerator, Callable, override, Any
+import asyncio
+import sys
+from typing import Dict, List, Generator, Tuple, AsyncGenerator, Callable, Final, Optional, override, Any
 from .BaseAgent import BaseAgent
-from context.conversation_manager import get_current_context
-from tools import (
-    execute_command,
-    read_or_search_file,
-    write_file,
-    sketch_pad_operations,
-)
+from tools import DEFAULT_TOOLKIT
 from context.schemas import Message
 
 
-class SampleAgent(BaseAgent):
+# SampleAgent 的系统提示词。作为模块常量定义并驻留，保证每轮请求的静态前缀逐字节一致，
+# 便于命中服务端的prompt缓存，也不受不同Python版本对docstring缩进处理差异的影响
+SAMPLE_AGENT_PROMPT: Final[str] = sys.intern("""
+# 🎯 身份描述
+你是一个专业的通用任务助手，能够处理各种复杂的多步骤任务。你使用中文与用户交流，采用TODO驱动的工作流程来确保任务的系统性和完整性。
+
+---
+
+# 🧭 工作流程架构
+
+你遵循基于TODO的状态机架构来驱动任务执行。所有的状态决策和转换都由你自主完成，每一步的状态和输出都必须记录在SketchPad中。
+
+## [核心工作流程]
+
+1. **接收任务**
+   - 用户输入任务需求
+   - 分析任务复杂度和范围
+   - 将任务需求保存到SketchPad，键名格式：`task_requirement_xxxx`
+
+2. **任务分解与规划**
+   - 将复杂任务分解为具体的TODO项目
+   - 创建结构化的TODO列表，每个TODO包含：
+     - 唯一ID
+     - 具体描述
+     - 状态（pending/in_progress/completed/cancelled）
+     - 优先级（high/medium/low）
+     - 依赖关系
+   - 将TODO列表保存到SketchPad，键名格式：`todo_list_xxxx`
+   - 向用户展示TODO计划并请求确认
 
-    @override
-    def get_toolkit(self) -> List[Callable]:
-        return [
-            execute_command,
-            read_or_search_file,
-            write_file,
-            sketch_pad_operations,
-        ]
+3. **执行TODO项目**
+   - 将TODO列表视为依赖图：所有`dependencies`都已`completed`的`pending`项目即为"就绪"项目
+   - 每一轮选出全部就绪项目；彼此独立的就绪项目在同一次回复中一并发起工具调用并行执行，而不是逐个串行
+   - 存在依赖关系的项目必须等待其依赖完成后再执行；同一轮中优先处理`high`优先级项目
+   - 在开始每个TODO前，将其状态更新为`in_progress`
+   - 使用相应的工具完成具体任务：
+     - `execute_command`: 执行命令行操作
+     - `read_or_search_file`: 读取或搜索文件内容
+     - `write_file`: 创建或修改文件
+     - `sketch_pad_operations`: 管理中间结果和状态
+   - 完成后将TODO状态更新为`completed`并记录执行结果
 
-    @override
-    def chat_impl(
-        self,
-        history: List[Dict[str, str]],
-        query: str,
-        sketch_pad_summary: str,
-    ) -> Generator[Tuple[str, List[Dict[str, str]]], None, None]:  # type: ignore[override]
-        """
-        # 🎯 身份描述
-        你是一个专业的通用任务助手，能够处理各种复杂的多步骤任务。你使用中文与用户交流，采用TODO驱动的工作流程来确保任务的系统性和完整性。
-
-        ---
-
-        # 🧭 工作流程架构
-
-        你遵循基于TODO的状态机架构来驱动任务执行。所有的状态决策和转换都由你自主完成，每一步的状态和输出都必须记录在SketchPad中。
-
-        ## [核心工作流程]
-
-        1. **接收任务**
-           - 用户输入任务需求
-           - 分析任务复杂度和范围
-           - 将任务需求保存到SketchPad，键名格式：`task_requirement_xxxx`
-
-        2. **任务分解与规划**
-           - 将复杂任务分解为具体的TODO项目
-           - 创建结构化的TODO列表，每个TODO包含：
-             - 唯一ID
-             - 具体描述
-             - 状态（pending/in_progress/completed/cancelled）
-             - 优先级（high/medium/low）
-             - 依赖关系
-           - 将TODO列表保存到SketchPad，键名格式：`todo_list_xxxx`
-           - 向用户展示TODO计划并请求确认
+4. **进度跟踪与更新**
+   - 实时更新TODO列表状态
+   - 记录每个步骤的执行结果和遇到的问题
+   - 如果遇到错误或阻塞，分析原因并调整计划
+   - 定期向用户汇报进度
 
-        3. **执行TODO项目**
-           - 按优先级和依赖关系顺序执行TODO项目
-           - 在开始每个TODO前，将其状态更新为`in_progress`
-           - 使用相应的工具完成具体任务：
-             - `execute_command`: 执行命令行操作
-             - `read_or_search_file`: 读取或搜索文件内容
-             - `write_file`: 创建或修改文件
-             - `sketch_pad_operations`: 管理中间结果和状态
-           - 完成后将TODO状态更新为`completed`并记录执行结果
+5. **任务完成**
+   - 确认所有TODO项目都已完成
+   - 生成任务执行总结
+   - 输出最终结果和相关文件路径
+   - 清理临时数据（可选）
 
-        4. **进度跟踪与更新**
-           - 实时更新TODO列表状态
-           - 记录每个步骤的执行结果和遇到的问题
-           - 如果遇到错误或阻塞，分析原因并调整计划
-           - 定期向用户汇报进度
+---
 
-        5. **任务完成**
-           - 确认所有TODO项目都已完成
-           - 生成任务执行总结
-           - 输出最终结果和相关文件路径
-           - 清理临时数据（可选）
+## [错误处理与调试]
 
-        ---
+- 当TODO执行失败时，自动进入调试模式
+- 分析错误原因并记录在SketchPad中
+- 尝试修复错误或调整执行策略
+- 如果无法自动修复，向用户说明情况并请求指导
+- 更新TODO状态为`cancelled`或创建新的修复TODO
 
-        ## [错误处理与调试]
+---
 
-        - 当TODO执行失败时，自动进入调试模式
-        - 分析错误原因并记录在SketchPad中
-        - 尝试修复错误或调整执行策略
-        - 如果无法自动修复，向用户说明情况并请求指导
-        - 更新TODO状态为`cancelled`或创建新的修复TODO
+# 🧰 工具使用指南
 
-        ---
+| 工具名称 | 用途 |
+|---------|------|
+| `execute_command` | 执行系统命令，如运行脚本、安装包、文件操作等 |
+| `read_or_search_file` | 读取文件内容或在文件中搜索特定内容 |
+| `write_file` | 创建新文件或修改现有文件，支持覆盖、修改、追加模式 |
+| `sketch_pad_operations` | 管理SketchPad数据：存储/检索/搜索/删除/列表/统计 |
+| `check_background_command` | 查询或取消以后台模式执行的命令，获取其输出 |
 
-        # 🧰 工具使用指南
+互不依赖的工具调用（如读取多个文件、同时运行相互独立的命令）应在同一次回复中一并发起；耗时较长的命令可以使用`execute_command`的后台模式，在其运行期间继续处理其他就绪的TODO。
 
-        | 工具名称 | 用途 |
-        |---------|------|
-        | `execute_command` | 执行系统命令，如运行脚本、安装包、文件操作等 |
-        | `read_or_search_file` | 读取文件内容或在文件中搜索特定内容 |
-        | `write_file` | 创建新文件或修改现有文件，支持覆盖、修改、追加模式 |
-        | `sketch_pad_operations` | 管理SketchPad数据：存储/检索/搜索/删除/列表/统计 |
+---
 
-        ---
+# 📋 SketchPad数据管理规范
 
-        # 📋 SketchPad数据管理规范
+## 数据存储规范
+- 任务需求：`task_requirement_[timestamp]`
+- TODO列表：`todo_list_[timestamp]`
+- 执行结果：`result_[todo_id]_[timestamp]`
+- 错误信息：`error_[todo_id]_[timestamp]`
+- 临时数据：`temp_[purpose]_[timestamp]`
 
-        ## 数据存储规范
-        - 任务需求：`task_requirement_[timestamp]`
-        - TODO列表：`todo_list_[timestamp]`
-        - 执行结果：`result_[todo_id]_[timestamp]`
-        - 错误信息：`error_[todo_id]_[timestamp]`
-        - 临时数据：`temp_[purpose]_[timestamp]`
+## 数据结构规范
+- TODO项目结构：
+```json
+{
+  "id": "unique_id",
+  "description": "具体描述",
+  "status": "pending|in_progress|completed|cancelled",
+  "priority": "high|medium|low",
+  "dependencies": ["other_todo_ids"],
+  "created_at": "timestamp",
+  "started_at": "timestamp",
+  "completed_at": "timestamp",
+  "result": "执行结果或错误信息"
+}
+```
 
-        ## 数据结构规范
-        - TODO项目结构：
-        ```json
-        {
-          "id": "unique_id",
-          "description": "具体描述",
-          "status": "pending|in_progress|completed|cancelled",
-          "priority": "high|medium|low",
-          "dependencies": ["other_todo_ids"],
-          "created_at": "timestamp",
-          "started_at": "timestamp",
-          "completed_at": "timestamp",
-          "result": "执行结果或错误信息"
-        }
-        ```
+---
 
-        ---
+# 🎯 行为约束
 
-        # 🎯 行为约束
+- 在开始任何任务前，必须使用`sketch_pad_operations: clear`清空SketchPad
+- 不要在没有用户确认的情况下执行危险操作
+- 对于复杂任务，主动建议任务分解
+- 始终保持TODO列表的实时更新
+- 在每个主要步骤完成后向用户汇报进度
+- 使用适当的emoji来标识不同类型的操作
 
-        - 在开始任何任务前，必须使用`sketch_pad_operations: clear`清空SketchPad
-        - 不要在没有用户确认的情况下执行危险操作
-        - 对于复杂任务，主动建议任务分解
-        - 始终保持TODO列表的实时更新
-        - 在每个主要步骤完成后向用户汇报进度
-        - 使用适当的emoji来标识不同类型的操作
+---
 
-        ---
+# 💡 响应格式示例
 
-        # 💡 响应格式示例
+### 进入 [任务分解与规划] 状态
 
-        ### 进入 [任务分解与规划] 状态
+🎯 **当前状态**: 任务分解与规划
 
-        🎯 **当前状态**: 任务分解与规划
+我将分析您的需求并创建结构化的TODO计划：
 
-        我将分析您的需求并创建结构化的TODO计划：
+[展示分解后的TODO列表]
 
-        [展示分解后的TODO列表]
+📋 **计划确认**: 这个执行计划是否符合您的预期？如果确认无误，我将开始执行；如果需要调整，请告诉我具体的修改建议。
 
-        📋 **计划确认**: 这个执行计划是否符合您的预期？如果确认无误，我将开始执行；如果需要调整，请告诉我具体的修改建议。
+### 进入 [执行TODO项目] 状态
 
-        ### 进入 [执行TODO项目] 状态
+⚡ **当前状态**: 执行TODO项目
 
-        ⚡ **当前状态**: 执行TODO项目
+正在执行: [TODO描述]
 
-        正在执行: [TODO描述]
+🔧 即将使用 `[工具名称]` 工具来 [具体操作]
 
-        🔧 即将使用 `[工具名称]` 工具来 [具体操作]
+[执行结果]
 
-        [执行结果]
+✅ **进度更新**: TODO项目已完成 (3/5)
 
-        ✅ **进度更新**: TODO项目已完成 (3/5)
+- 始终使用换行符分隔状态说明
+- 用`###`标题标记当前状态
+- 使用适当的emoji标识操作类型
+- 在每个状态转换时明确说明下一步行动
+""")
 
-        - 始终使用换行符分隔状态说明
-        - 用`###`标题标记当前状态
-        - 使用适当的emoji标识操作类型
-        - 在每个状态转换时明确说明下一步行动
-        """
+
+class SampleAgent(BaseAgent):
+
+    __slots__ = ()
+
+    @override
+    def get_toolkit(self) -> List[Callable]:
+        return list(DEFAULT_TOOLKIT)
+
+    @override
+    def chat_impl(
+        self,
+        history: List[Dict[str, str]],
+        query: str,
+    ) -> Generator[Tuple[str, List[Dict[str, str]]], None, None]:  # type: ignore[override]
         return   # type: ignore[return-value]
 
+    chat_impl.__doc__ = SAMPLE_AGENT_PROMPT
+
     async def run(self, query: str) -> AsyncGenerator[Any, None]:  # type: ignore[override]
         """Run the agent with the given query.
 
@@ -182,48 +185,53 @@ class SampleAgent(BaseAgent):
         if not query:
             raise ValueError("Query must not be empty")
 
-        # 获得SketchPad的key和截断的value内容
-        sketch_pad_summary = self.get_sketch_pad_summary()
-
         # 获取当前的 conversation context
-        current_context = get_current_context()
-        if current_context is None:
-            raise RuntimeError("No active conversation context")
-
-        # 将已有消息转换为LLM所需的 history[List[Dict[str, str]]]
-        def _message_content_to_text(content: Any) -> str:
-            if isinstance(content, str) or content is None:
-                return content or ""
-            if isinstance(content, list):
-                text_parts: List[str] = []
-                for item in content:
-                    try:
-                        # pydantic 模型有属性访问，字典走键访问
-                        item_type = getattr(item, "type", None) or (item.get("type") if isinstance(item, dict) else None)
-                        if item_type == "text":
-                            text_val = getattr(item, "text", None) or (item.get("text") if isinstance(item, dict) else None)
-                            if isinstance(text_val, str):
-                                text_parts.append(text_val)
-                    except Exception:
-                        continue
-                return " ".join(text_parts)
-            return str(content)
-
-        history_messages = current_context.retrieve_messages()
-        history: List[Dict[str, str]] = []
-        for m in history_messages:
-            if m.role in ("user", "assistant"):
-                history.append({
-                    "role": m.role,
-                    "content": _message_content_to_text(m.content),
-                })
+        current_context = self._require_context()
+
+        # 会话状态未变化时重复的查询（如重试）直接重放上次的回复
+        cached_reply = self.get_cached_reply(query)
+        if cached_reply is not None:
+            cached_chunks, reply_text = cached_reply
+            # 重放的回合同样写入上下文，使历史与客户端看到的内容一致
+            await current_context.store_message(Message(role="user", content=query))
+            if reply_text:
+                await current_context.store_message(
+                    Message(role="assistant", content=reply_text)
+                )
+            for raw in cached_chunks:
+                yield raw
+            return
+
+        # SketchPad摘要、对话摘要与LLM所需的history都是同步的Redis读取，放到线程中并发执行，避免阻塞事件循环
+        sketch_pad_summary, conversation_summary, history = await asyncio.gather(
+            asyncio.to_thread(self.get_sketch_pad_summary),
+            asyncio.to_thread(current_context.get_summary),
+            asyncio.to_thread(current_context.get_formatted_history),
+        )
+
+        # 较早的历史被总结后只保留在摘要中，放在history开头，摘要不变时前缀保持稳定
+        if conversation_summary:
+            history.insert(0, self.build_summary_message(conversation_summary))
 
         # 在开始对话前，将当前用户消息写入上下文存储
         await current_context.store_message(Message(role="user", content=query))
 
+        # SketchPad摘要每轮都会变化，放在history末尾而不是提示词中，保持静态前缀可缓存
+        history.append(self.build_runtime_message(sketch_pad_summary))
+
         # 调用 LLM（raw 流模式）
-        response_packages = self.chat(history, query, sketch_pad_summary)
+        response_packages = self.chat(history, query)
 
-        # 复用基类的流式处理与历史持久化
+        # 复用基类的流式处理与历史持久化，回复缓存开启时同时记录完整回复以便重试时重放
+        reply_chunks: Optional[List[Any]] = [] if self._get_reply_cache_ttl() > 0 else None
+        max_chunks = self._reply_cache_max_chunks
         async for raw in self._stream_and_persist(response_packages):
+            if reply_chunks is not None:
+                if len(reply_chunks) < max_chunks:
+                    reply_chunks.append(raw)
+                else:
+                    reply_chunks = None
             yield raw
+
+        if reply_chunks is not None:
+            self.cache_reply(query, reply_chunks)
@@ -1,48 +1,66 @@
 from SimpleLLMFunc import OpenAICompatible
 from functools import lru_cache
+from pathlib import Path
 import os
-from typing import Optional
+from typing import Any, Dict, Optional
 from dotenv import load_dotenv
 
 # 加载工作目录下的.env文件
 load_dotenv()
 
 
-current_file_dir = (
-    __file__.rsplit("/", 1)[0] if "/" in __file__ else __file__.rsplit("\\", 1)[0]
-)
+CONFIG_DIR = Path(__file__).resolve().parent
+JSON_FILE = CONFIG_DIR / "provider.json"
+
+
+@lru_cache(maxsize=1)
+def load_interface_collection() -> Dict[str, Dict[str, OpenAICompatible]]:
+    """加载（并缓存）provider.json中的全部模型接口，整个进程只解析一次"""
+    return OpenAICompatible.load_from_json_file(str(JSON_FILE))
+
+
+class _Interface:
+    """
+    延迟解析的模型接口配置项
+
+    首次访问时才加载provider.json，之后直接返回缓存中的接口对象
+    """
+
+    __slots__ = ("provider", "model")
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+
+    def __get__(self, instance: Any, owner: Any = None) -> OpenAICompatible:
+        return load_interface_collection()[self.provider][self.model]
 
 
 class Config:
 
-    JSON_FILE = current_file_dir + "/provider.json"
-    INTERFACE_COLLECTION = OpenAICompatible.load_from_json_file(JSON_FILE)
+    JSON_FILE = str(JSON_FILE)
+
+    # BASIC_INTERFACE = _Interface("chatanywhere", "gpt-4o")
+    # BASIC_INTERFACE = _Interface("chatanywhere", "gemini-2.5-pro-preview-06-05")
+    # BASIC_INTERFACE = _Interface("chatanywhere", "gemini-2.5-flash")
+    # BASIC_INTERFACE = _Interface("chatanywhere", "anthropic/claude-sonnet-4")
+    # BASIC_INTERFACE = _Interface("chatanywhere", "openai/gpt-5-chat")
+    BASIC_INTERFACE = _Interface("chatanywhere", "z-ai/glm-4.5")
+    CODE_INTERFACE = _Interface("chatanywhere", "google/gemini-2.5-pro")
+    # CODE_INTERFACE = _Interface("chatanywhere", "qwen/qwen3-coder:free")
 
-    # BASIC_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["gpt-4o"]
-    # BASIC_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["gemini-2.5-pro-preview-06-05"]
-    # BASIC_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["gemini-2.5-flash"]
-    # BASIC_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["anthropic/claude-sonnet-4"]
-    # BASIC_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["openai/gpt-5-chat"]
-    BASIC_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["z-ai/glm-4.5"]
-    CODE_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["google/gemini-2.5-pro"]
-    # CODE_INTERFACE = INTERFACE_COLLECTION["chatanywhere"]["qwen/qwen3-coder:free"]
 
+    REASONING_INTERFACE = _Interface("chatanywhere", "anthropic/claude-sonnet-4")
 
-    REASONING_INTERFACE = INTERFACE_COLLECTION["chatanywhere"][
-        "anthropic/claude-sonnet-4"
-    ]
+    QUICK_INTERFACE = _Interface("chatanywhere", "google/gemini-2.5-flash")
 
-    QUICK_INTERFACE = INTERFACE_COLLECTION["chatanywhere"][
-        "google/gemini-2.5-flash"
-    ]
+    MULTIMODALITY_INTERFACE = _Interface("chatanywhere", "google/gemini-2.5-flash")
 
-    MULTIMODALITY_INTERFACE = INTERFACE_COLLECTION["chatanywhere"][
-        "google/gemini-2.5-flash"
-    ]
+    CONTEXT_SUMMARY_INTERFACE = _Interface("chatanywhere", "google/gemini-2.5-flash")
 
-    CONTEXT_SUMMARY_INTERFACE = INTERFACE_COLLECTION["chatanywhere"][
-        "google/gemini-2.5-flash"
-    ]
+    @property
+    def INTERFACE_COLLECTION(self) -> Dict[str, Dict[str, OpenAICompatible]]:
+        return load_interface_collection()
 
     # ==================== RAGFlow 配置参数 ====================
 
@@ -80,10 +98,29 @@ class Config:
     # 上下文存储目录配置
     CONTEXT_DIR: str = os.getenv("CONTEXT_DIR", "data/contexts")
     CONTEXT_MAX_HISTORY_LENGTH: int = int(os.getenv("CONTEXT_MAX_HISTORY_LENGTH", 10))
+    # 历史总结结果在Redis中的缓存时间（秒），<=0 表示不缓存
+    CONTEXT_SUMMARY_CACHE_TTL: int = int(os.getenv("CONTEXT_SUMMARY_CACHE_TTL", 86400))
+    # 历史估算token数超过该阈值时提前触发总结（约为上下文窗口的80%），<=0 表示只按消息条数触发
+    CONTEXT_TOKEN_THRESHOLD: int = int(os.getenv("CONTEXT_TOKEN_THRESHOLD", 102400))
+    # 总结历史时原样保留的最近消息条数
+    CONTEXT_KEEP_RECENT: int = int(os.getenv("CONTEXT_KEEP_RECENT", 6))
     
     # SketchPad存储目录配置  
     SKETCH_DIR: str = os.getenv("SKETCH_DIR", "data/sketches")
 
+    # ==================== 流式输出配置参数 ====================
+
+    # SSE 合并输出的最小间隔（秒），<=0 表示逐块输出
+    STREAM_COALESCE_INTERVAL: float = float(os.getenv("STREAM_COALESCE_INTERVAL", 0.025))
+    # 单次合并输出的最大字符数，超过后立即输出
+    STREAM_COALESCE_MAX_CHARS: int = int(os.getenv("STREAM_COALESCE_MAX_CHARS", 8192))
+
+    # ==================== Agent 配置参数 ====================
+
+    # 回复重放缓存的有效期（秒），<=0 表示关闭。开启后，会话状态未变化时有效期内重复发送的
+    # 相同查询（如重试、"继续"）会直接重放上次的回复并写入历史，而不会重新请求LLM
+    AGENT_REPLY_CACHE_TTL: float = float(os.getenv("AGENT_REPLY_CACHE_TTL", 30))
+
 
 @lru_cache()
 def get_config() -> Config:
@@ -1,12 +1,102 @@
-from typing import Dict, List, Optional, Any, Union, override
+from typing import Deque, Dict, List, Optional, Any, Tuple, Union, override
+from collections import deque
 from SimpleLLMFunc import async_llm_function, OpenAICompatible
-import json
+import asyncio
+import atexit
+import hashlib
+import orjson
 import os
 import redis
 import threading
+import weakref
 from datetime import datetime
 from abc import ABC, abstractmethod
 from context.schemas import Message, ChatMessages
+from context.redis_pool import get_redis_pool
+
+
+def _content_item_text(item: Any) -> Optional[str]:
+    """提取单个多模态内容块中的文本，非文本块返回None"""
+    # 字典按键读取，pydantic 模型走属性访问
+    if isinstance(item, dict):
+        if item.get("type") != "text":
+            return None
+        text_val = item.get("text")
+    else:
+        if getattr(item, "type", None) != "text":
+            return None
+        text_val = getattr(item, "text", None)
+    return text_val if isinstance(text_val, str) else None
+
+
+def _message_content_to_text(content: Any) -> str:
+    """将消息内容（字符串、None或多模态块列表）转换为纯文本"""
+    if isinstance(content, str):
+        return content
+    if content is None:
+        return ""
+    if isinstance(content, list):
+        text_parts: List[str] = []
+        for item in content:
+            text_val = _content_item_text(item)
+            if text_val is not None:
+                text_parts.append(text_val)
+        return " ".join(text_parts)
+    return str(content)
+
+
+def _compact_for_summary(messages: List[Message]) -> str:
+    """
+    将消息压缩为 "role: 内容" 的纯文本，供历史总结使用
+
+    不包含时间戳、tool_call_id 等对总结无用的字段；助手的工具调用只保留函数名与参数。
+    """
+    lines: List[str] = []
+    for message in messages:
+        text = _message_content_to_text(message.content)
+        if text:
+            lines.append(f"{message.role}: {text}")
+        for tool_call in message.tool_calls or ():
+            function = tool_call.function
+            lines.append(f"{message.role} -> {function.name}({function.arguments})")
+    return "\n".join(lines)
+
+
+def _lower_content(message: Message) -> Optional[str]:
+    """消息内容的小写形式（供搜索使用），非字符串内容返回None"""
+    content = message.content
+    return content.lower() if isinstance(content, str) else None
+
+
+def _format_history_entry(message: Message) -> Optional[Tuple[str, str]]:
+    """将消息转换为 (role, 纯文本content) 的不可变条目，非user/assistant消息返回None"""
+    if message.role not in ("user", "assistant"):
+        return None
+    return (message.role, _message_content_to_text(message.content))
+
+
+def summary_digest(summary: str) -> str:
+    """对话摘要的内容版本号（摘要文本的md5），摘要不变时保持不变，可用于组合缓存键"""
+    return hashlib.md5(summary.encode("utf-8")).hexdigest()
+
+
+def metadata_sidecar_path(file_path: str) -> str:
+    """上下文快照对应的元数据文件路径（ctx_xxx.json -> ctx_xxx.meta.json），列出上下文时无需解析整个快照"""
+    root, _ = os.path.splitext(file_path)
+    return f"{root}.meta.json"
+
+
+# 有尚未落盘的延迟写入的上下文后端；进程退出时事件循环中的延迟写入任务可能来不及执行，由退出钩子补写
+_pending_persist_backends: "weakref.WeakSet[RedisFileContextBackend]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_pending_persists() -> None:
+    """进程退出前同步写入所有尚未落盘的上下文"""
+    for backend in list(_pending_persist_backends):
+        if backend._persist_dirty:
+            backend._persist_dirty = False
+            backend._persist_sync()
 
 
 class ContextBackend(ABC):
@@ -50,6 +140,37 @@ class ContextBackend(ABC):
         """获取消息历史"""
         pass
 
+    def get_formatted_history(self) -> List[Dict[str, str]]:
+        """
+        获取适合作为LLM history的消息列表
+
+        仅包含user/assistant消息，内容转换为纯文本。后端可以重写此方法以缓存格式化结果。
+
+        Returns:
+            List[Dict[str, str]]: 形如 {"role": ..., "content": ...} 的消息列表
+        """
+        history: List[Dict[str, str]] = []
+        for message in self.retrieve_messages():
+            entry = _format_history_entry(message)
+            if entry is not None:
+                history.append({"role": entry[0], "content": entry[1]})
+        return history
+
+    @property
+    def version(self) -> Optional[int]:
+        """
+        内容版本号，消息、摘要发生变化时改变
+
+        返回None表示该后端不跟踪版本，调用方不应据此缓存。
+        """
+        return None
+
+    @property
+    def summary_version(self) -> Optional[str]:
+        """当前对话摘要的版本号（见 summary_digest），没有摘要时为None"""
+        summary = self.get_summary()
+        return summary_digest(summary) if summary else None
+
     @abstractmethod
     def update_summary(self, summary: str) -> None:
         """更新对话摘要"""
@@ -135,6 +256,10 @@ class RedisFileContextBackend(ContextBackend):
     4. 利用Redis AOF + RDB机制
     """
 
+    # 历史总结函数缓存：id(llm_interface) -> (llm_interface, 装饰后的总结函数)
+    _summarize_func_cache: Dict[int, Tuple[OpenAICompatible, Any]] = {}
+    _summarize_func_lock = threading.Lock()
+
     @override
     def __init__(
         self,
@@ -145,6 +270,9 @@ class RedisFileContextBackend(ContextBackend):
         redis_port: int = 6379,
         redis_db: int = 0,
         file_path: Optional[str] = None,
+        summary_cache_ttl: int = 86400,
+        token_threshold: int = 0,
+        keep_recent: int = 6,
     ):
         """
         初始化Redis文件后端
@@ -157,6 +285,9 @@ class RedisFileContextBackend(ContextBackend):
             redis_port: Redis端口
             redis_db: Redis数据库编号
             file_path: 文件持久化路径
+            summary_cache_ttl: 历史总结结果的缓存时间（秒），<=0 表示不缓存
+            token_threshold: 历史估算token数超过该值时提前触发总结，<=0 表示只按消息条数触发
+            keep_recent: 总结时原样保留的最近消息条数（不超过max_history_length的一半）
         """
         self.context_id = context_id
         self.llm_interface = llm_interface
@@ -165,23 +296,51 @@ class RedisFileContextBackend(ContextBackend):
         
         # Redis连接
         self.redis_client = redis.Redis(
-            host=redis_host,
-            port=redis_port,
-            db=redis_db,
-            decode_responses=True
+            connection_pool=get_redis_pool(redis_host, redis_port, redis_db, decode_responses=True)
         )
         
         # 线程锁
         self._lock = threading.RLock()
+
+        # 历史总结结果在Redis中的缓存时间（秒），<=0 表示不缓存
+        self.summary_cache_ttl: int = summary_cache_ttl
+
+        # 按token预算触发总结：与Redis消息列表对应的每条消息token估算值（旧->新）及其总和，
+        # None表示需要从Redis重建
+        self.token_threshold: int = token_threshold
+        self.keep_recent: int = keep_recent
+        # 异步写入路径（写入、总结、裁剪）的锁：同一上下文的消息按调用顺序依次写入，
+        # 同时保证只有一次总结在进行。线程锁 _lock 只在工作线程内的同步片段中短暂持有，从不跨越 await
+        self._write_lock = asyncio.Lock()
+        self._token_counts: Optional[Deque[int]] = None
+        self._token_estimate = 0
+
+        # 消息列表的进程内写穿缓存（旧->新），读取时不再逐次 LRANGE 并解析；
+        # None表示需要从Redis重建。不设maxlen：总结前列表会暂时超出上限一条
+        self._message_cache: Optional[Deque[Message]] = None
+
+        # 内容版本号，消息、摘要或元数据变化时递增
+        self._version = 0
+
+        # 延迟持久化：store_message 只标记脏数据，由后台任务合并写入
+        self._persist_delay: float = 0.5
+        self._persist_dirty = False
+        self._persist_task: Optional[asyncio.Task] = None
+        # 最近一次写入文件时的内容版本号，版本未变化时无需重复写入整个快照
+        self._persisted_version: Optional[int] = None
+
+        # 格式化history缓存，与Redis中的消息列表一一对应（旧->新），
+        # 非user/assistant消息占位为None；None表示需要从Redis重建。
+        # 定长deque作为环形缓冲区，追加新消息时自动淘汰最旧的条目，与ltrim保持一致
+        # 条目为不可变的 (role, content) 元组，只在返回时构造LLM所需的字典，缓存本身无需防御性拷贝
+        self._formatted_cache: Optional[Deque[Optional[Tuple[str, str]]]] = None
+        # 搜索用的小写内容缓存，同样与Redis中的消息列表一一对应（旧->新），非字符串内容占位为None
+        self._lower_cache: Optional[Deque[Optional[str]]] = None
         
-        # 初始化历史总结函数
-        self._summarize_func = None
-        if self.llm_interface:
-            self._summarize_func = async_llm_function(
-                llm_interface=self.llm_interface,
-                toolkit=[],
-                timeout=600,
-            )(self._summarize_history_impl)
+        # 初始化历史总结函数（按LLM接口在类级别复用装饰结果）
+        self._summarize_func = (
+            self._get_summarize_func(self.llm_interface) if self.llm_interface else None
+        )
         
         # 初始化元数据
         self._init_metadata()
@@ -189,13 +348,38 @@ class RedisFileContextBackend(ContextBackend):
         # 尝试从存储恢复数据
         self._restore_from_storage()
 
+    @classmethod
+    def _get_summarize_func(cls, llm_interface: OpenAICompatible) -> Any:
+        """
+        获取经 async_llm_function 装饰的历史总结函数
+
+        装饰会解析提示词与签名，每个会话都重新装饰代价较高，
+        因此按LLM接口缓存在类上，所有使用同一接口的上下文共享同一个总结函数。
+        """
+        key = id(llm_interface)
+        cached = cls._summarize_func_cache.get(key)
+        if cached is None:
+            with cls._summarize_func_lock:
+                cached = cls._summarize_func_cache.get(key)
+                if cached is None:
+                    func = async_llm_function(
+                        llm_interface=llm_interface,
+                        toolkit=[],
+                        timeout=600,
+                    )(cls._summarize_history_impl)
+                    # 同时持有接口对象，保证缓存期间其id不会被复用
+                    cached = (llm_interface, func)
+                    cls._summarize_func_cache[key] = cached
+        return cached[1]
+
     def _init_metadata(self) -> None:
         """初始化元数据"""
+        now_iso = datetime.now().isoformat()
         self._metadata = {
             "context_id": self.context_id,
             "session_id": self._generate_session_id(),
-            "start_time": datetime.now().isoformat(),
-            "last_activity": datetime.now().isoformat(),
+            "start_time": now_iso,
+            "last_activity": now_iso,
             "total_messages": 0,
             "max_history_length": self.max_history_length,
         }
@@ -219,57 +403,155 @@ class RedisFileContextBackend(ContextBackend):
         Returns:
             None
         """
-        with self._lock:
+        async with self._write_lock:
+            # 消息时间戳与last_activity共用同一次格式化的时间字符串
+            now_iso = datetime.now().isoformat()
+
             # 确保消息有时间戳
             if message.timestamp is None:
-                message.timestamp = datetime.now().isoformat()
-            
-            # 存储到Redis
+                message.timestamp = now_iso
+
+            # 写入Redis并更新各项缓存，网络往返在工作线程中执行，不阻塞事件循环上的其他会话
+            message_count = await asyncio.to_thread(self._append_message_sync, message)
+
+            # 自动内存管理
+            await self._auto_memory_manage(message_count)
+
+            # 裁剪超出上限的历史并更新元数据
+            await asyncio.to_thread(self._finish_store_sync, message_count, now_iso)
+
+            # 自动持久化：合并短时间内的多次写入，由后台任务统一落盘
+            self._schedule_persist()
+
+    def _append_message_sync(self, message: Message) -> int:
+        """
+        将消息写入Redis并追加到各项缓存
+
+        Returns:
+            int: 写入后Redis列表的长度
+        """
+        with self._lock:
             messages_key = self._get_redis_key("messages")
             message_data = message.model_dump_json()
-            self.redis_client.lpush(messages_key, message_data)
-            
-            # 自动内存管理
-            await self._auto_memory_manage()
+            if self.llm_interface:
+                # LPUSH 直接返回列表新长度，省去额外的 LLEN 往返；
+                # 总结需要读到超出上限的消息，因此裁剪留到总结之后
+                message_count = self.redis_client.lpush(messages_key, message_data)
+            else:
+                # 不做总结时写入与裁剪没有依赖，通过同一个pipeline一次往返完成
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.lpush(messages_key, message_data)
+                pipe.ltrim(messages_key, 0, self.max_history_length - 1)
+                message_count = min(pipe.execute()[0], self.max_history_length)
+            self._version += 1
+            if self._message_cache is not None:
+                # 缓存保存调用方消息的副本，之后调用方修改原对象不会影响缓存
+                self._message_cache.append(message.model_copy(deep=True))
+            if self._formatted_cache is not None:
+                self._formatted_cache.append(_format_history_entry(message))
+            if self._lower_cache is not None:
+                self._lower_cache.append(_lower_content(message))
+            self._track_tokens(message_data)
+            return message_count
+
+    def _finish_store_sync(self, message_count: int, now_iso: str) -> None:
+        """裁剪超出上限的历史（只有超出上限时才需要裁剪）并更新元数据"""
+        with self._lock:
+            if message_count > self.max_history_length:
+                messages_key = self._get_redis_key("messages")
+                self.redis_client.ltrim(messages_key, 0, self.max_history_length - 1)
+            if self._message_cache is not None:
+                while len(self._message_cache) > self.max_history_length:
+                    self._message_cache.popleft()
 
-            # 限制历史长度
-            self.redis_client.ltrim(messages_key, 0, self.max_history_length - 1)
-            
-            # 更新元数据
             current_total = self._metadata.get("total_messages", 0)
             if isinstance(current_total, (int, float)):
                 self._metadata["total_messages"] = int(current_total) + 1
             else:
                 self._metadata["total_messages"] = 1
-            self._metadata["last_activity"] = datetime.now().isoformat()
-            
-            # 自动持久化
-            await self.persist()
-            
+            self._metadata["last_activity"] = now_iso
 
-    @override
-    def retrieve_messages(self, limit: Optional[int] = None) -> List[Message]:
-        """获取消息历史"""
-        with self._lock:
+    def count_tokens(self, text: str) -> int:
+        """
+        估算文本的token数
+
+        默认按约4个字符对应1个token近似估算；接入真实tokenizer时可重写此方法。
+        """
+        return len(text) // 4
+
+    def _track_tokens(self, message_data: str) -> None:
+        """在消息写入Redis后增量更新token估算（调用方需持有锁）"""
+        if self._token_counts is None:
+            # 从Redis重建，此时列表中已包含刚写入的消息（LPUSH 使最新消息在前）
+            messages_key = self._get_redis_key("messages")
+            self._token_counts = deque(
+                (self.count_tokens(data) for data in reversed(self.redis_client.lrange(messages_key, 0, -1))),
+                maxlen=self.max_history_length,
+            )
+            self._token_estimate = sum(self._token_counts)
+            return
+        if len(self._token_counts) == self._token_counts.maxlen:
+            # 最旧的消息即将被ltrim移除
+            self._token_estimate -= self._token_counts[0]
+        tokens = self.count_tokens(message_data)
+        self._token_counts.append(tokens)
+        self._token_estimate += tokens
+
+    def _cached_messages(self) -> Deque[Message]:
+        """
+        获取（必要时从Redis重建）消息缓存，调用方需持有 _lock
+
+        缓存中的消息对象只在内部读取，不会交给调用方，因此不会被外部修改。
+        """
+        if self._message_cache is None:
             messages_key = self._get_redis_key("messages")
             message_data_list = self.redis_client.lrange(messages_key, 0, -1)
-            
+
             messages = []
             for message_data in message_data_list:
                 try:
-                    message_dict = json.loads(message_data)
-                    message = Message(**message_dict)
-                    messages.append(message)
+                    messages.append(Message.model_validate_json(message_data))
                 except Exception as e:
                     print(f"Warning: Failed to deserialize message: {e}")
-            
-            # 按时间排序（最新的在前）
+
+            # 列表中最新的消息在前，缓存按时间排序（最旧的在前）
             messages.reverse()
-            
-            if limit is not None:
-                messages = messages[-limit:]
-            
-            return messages
+            self._message_cache = deque(messages)
+        return self._message_cache
+
+    def _snapshot_messages(self) -> List[Message]:
+        """在锁内取得消息缓存的浅拷贝列表，仅供内部只读使用"""
+        with self._lock:
+            return list(self._cached_messages())
+
+    @override
+    def retrieve_messages(self, limit: Optional[int] = None) -> List[Message]:
+        """获取消息历史（返回副本，修改返回值不会影响缓存）"""
+        with self._lock:
+            messages = list(self._cached_messages())
+        if limit:
+            messages = messages[-limit:]
+        return [message.model_copy(deep=True) for message in messages]
+
+    @override
+    def get_formatted_history(self) -> List[Dict[str, str]]:
+        """获取适合作为LLM history的消息列表，只在新增消息时增量格式化"""
+        with self._lock:
+            if self._formatted_cache is None:
+                self._formatted_cache = deque(
+                    (_format_history_entry(message) for message in self._cached_messages()),
+                    maxlen=self.max_history_length,
+                )
+            return [
+                {"role": role, "content": content}
+                for role, content in filter(None, self._formatted_cache)
+            ]
+
+    @property
+    @override
+    def version(self) -> Optional[int]:
+        """内容版本号"""
+        return self._version
 
     @override
     def update_summary(self, summary: str) -> None:
@@ -277,13 +559,13 @@ class RedisFileContextBackend(ContextBackend):
         with self._lock:
             summary_key = self._get_redis_key("summary")
             self.redis_client.set(summary_key, summary)
+            self._version += 1
 
     @override
     def get_summary(self) -> Optional[str]:
-        """获取对话摘要"""
-        with self._lock:
-            summary_key = self._get_redis_key("summary")
-            return self.redis_client.get(summary_key)
+        """获取对话摘要（单次 GET 本身是原子的，无需加锁）"""
+        summary_key = self._get_redis_key("summary")
+        return self.redis_client.get(summary_key)
 
     @override
     def update_metadata(self, metadata: Dict[str, Any]) -> None:
@@ -291,13 +573,13 @@ class RedisFileContextBackend(ContextBackend):
         with self._lock:
             self._metadata.update(metadata)
             metadata_key = self._get_redis_key("metadata")
-            self.redis_client.set(metadata_key, json.dumps(self._metadata))
+            self.redis_client.set(metadata_key, orjson.dumps(self._metadata, default=str))
+            self._version += 1
 
     @override
     def get_metadata(self) -> Dict[str, Any]:
-        """获取元数据"""
-        with self._lock:
-            return self._metadata.copy()
+        """获取元数据的拷贝（只读，不加锁：键均为字符串，dict 拷贝在GIL下一次完成）"""
+        return dict(self._metadata)
 
     @override
     def search_messages(self, query: str, limit: int = 5) -> List[Message]:
@@ -311,36 +593,53 @@ class RedisFileContextBackend(ContextBackend):
         Returns:
             List[Message]: 搜索结果列表
         """
-        messages = self.retrieve_messages()
-        results = []
         query_lower = query.lower()
 
-        for message in reversed(messages):
-            content = message.content
-            if isinstance(content, str) and query_lower in content.lower():
-                results.append(message)
-                if len(results) >= limit:
-                    break
+        with self._lock:
+            if self._lower_cache is None:
+                self._lower_cache = deque(
+                    (_lower_content(message) for message in self._cached_messages()),
+                    maxlen=self.max_history_length,
+                )
+            lower_contents = list(self._lower_cache)
+            messages = list(self._cached_messages())
+
+        results = []
+
+        # 从最新的消息开始，与小写缓存逐条对应，只用缓存的小写内容做匹配
+        for lower_content, message in zip(reversed(lower_contents), reversed(messages)):
+            if lower_content is None or query_lower not in lower_content:
+                continue
+            results.append(message.model_copy(deep=True))
+            if len(results) >= limit:
+                break
 
         return list(reversed(results))
 
     @override
     def get_message_count(self) -> int:
-        """获取消息数量"""
-        with self._lock:
-            messages_key = self._get_redis_key("messages")
-            return self.redis_client.llen(messages_key)
+        """获取消息数量（只读，不加锁：先取缓存引用，避免判断后缓存被并发重置）"""
+        message_cache = self._message_cache
+        if message_cache is not None:
+            return len(message_cache)
+        messages_key = self._get_redis_key("messages")
+        return self.redis_client.llen(messages_key)
 
     @override
     def clear_messages(self, keep_summary: bool = True) -> None:
         """清空消息历史"""
         with self._lock:
-            messages_key = self._get_redis_key("messages")
-            self.redis_client.delete(messages_key)
-            
+            keys = [self._get_redis_key("messages")]
             if not keep_summary:
-                summary_key = self._get_redis_key("summary")
-                self.redis_client.delete(summary_key)
+                keys.append(self._get_redis_key("summary"))
+            # 消息与摘要在一次 DEL 中删除
+            self.redis_client.delete(*keys)
+            self._message_cache = deque()
+            self._formatted_cache = deque(maxlen=self.max_history_length)
+            self._lower_cache = deque(maxlen=self.max_history_length)
+            self._token_counts = deque(maxlen=self.max_history_length)
+            self._token_estimate = 0
+            self._version += 1
             
             self._metadata["total_messages"] = 0
             self._metadata["last_activity"] = datetime.now().isoformat()
@@ -352,7 +651,8 @@ class RedisFileContextBackend(ContextBackend):
             return {
                 "context_id": self.context_id,
                 "metadata": self._metadata,
-                "messages": [msg.model_dump() for msg in self.retrieve_messages()],
+                # 整个列表通过 RootModel 一次性导出，不再逐条调用 model_dump
+                "messages": ChatMessages.model_construct(list(self._cached_messages())).model_dump(),
                 "summary": self.get_summary(),
                 "serialization_timestamp": datetime.now().isoformat(),
             }
@@ -368,15 +668,27 @@ class RedisFileContextBackend(ContextBackend):
             # 恢复消息
             if "messages" in data:
                 messages_key = self._get_redis_key("messages")
-                self.redis_client.delete(messages_key)
+                self._message_cache = None
+                self._formatted_cache = None
+                self._lower_cache = None
+                self._token_counts = None
+                self._version += 1
                 
+                # 删除旧列表与写入全部消息通过同一个pipeline一次往返完成
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.delete(messages_key)
+                message_jsons = []
                 for message_data in data["messages"]:
                     try:
-                        message = Message(**message_data)
-                        message_json = message.model_dump_json()
-                        self.redis_client.rpush(messages_key, message_json)
+                        message = Message.model_validate(message_data)
+                        message_jsons.append(message.model_dump_json())
                     except Exception as e:
                         print(f"Warning: Failed to deserialize message: {e}")
+                if message_jsons:
+                    # 快照按时间排序（最旧的在前），而Redis列表中最新的消息在前，
+                    # 按顺序 LPUSH 后最新的消息位于列表头部
+                    pipe.lpush(messages_key, *message_jsons)
+                pipe.execute()
             
             # 恢复摘要
             if "summary" in data and data["summary"]:
@@ -384,37 +696,83 @@ class RedisFileContextBackend(ContextBackend):
 
     @override
     async def persist(self) -> bool:
-        """持久化到文件"""
+        """持久化到文件（序列化与写文件在线程中执行，不阻塞事件循环）"""
+        # 显式持久化会覆盖尚未执行的延迟写入
+        self._persist_dirty = False
+        return await asyncio.to_thread(self._persist_sync)
+
+    def _persist_sync(self) -> bool:
+        """同步地序列化并写入文件（内容自上次落盘后未变化时跳过）"""
         try:
+            # 序列化数据，同时记下对应的版本号
+            with self._lock:
+                version = self._version
+                if version == self._persisted_version and os.path.exists(self.file_path):
+                    return True
+                data = self.serialize()
+
             # 确保目录存在
             dir_path = os.path.dirname(self.file_path)
             if dir_path:
                 os.makedirs(dir_path, exist_ok=True)
             
-            # 序列化数据
-            data = self.serialize()
-            
-            # 写入文件
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            
+            # 先写临时文件再原子替换，写入中途失败不会损坏已有快照
+            tmp_path = f"{self.file_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(data))
+            os.replace(tmp_path, self.file_path)
+
+            # 元数据另存一份小文件，供 list_contexts 读取
+            meta_path = metadata_sidecar_path(self.file_path)
+            tmp_path = f"{meta_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(data["metadata"], default=str))
+            os.replace(tmp_path, meta_path)
+
+            self._persisted_version = version
             return True
         except Exception as e:
             print(f"Warning: Failed to persist context: {e}")
             return False
 
+    def _schedule_persist(self) -> None:
+        """标记需要持久化，并在没有待执行的写入任务时启动一个延迟写入任务"""
+        self._persist_dirty = True
+        _pending_persist_backends.add(self)
+        if self._persist_task is not None and not self._persist_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # 没有运行中的事件循环，直接同步写入
+            self._persist_dirty = False
+            self._persist_sync()
+            return
+        self._persist_task = loop.create_task(self._debounced_persist())
+
+    async def _debounced_persist(self) -> None:
+        """等待一小段时间收集后续写入，然后一次性落盘"""
+        await asyncio.sleep(self._persist_delay)
+        while self._persist_dirty:
+            self._persist_dirty = False
+            await asyncio.to_thread(self._persist_sync)
+        _pending_persist_backends.discard(self)
+
     @override
     async def restore(self) -> bool:
         """从文件恢复"""
-        if not os.path.exists(self.file_path):
-            return False
-        
+        return self._restore_sync()
+
+    def _restore_sync(self) -> bool:
+        """同步地从文件恢复"""
         try:
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(self.file_path, "rb") as f:
+                data = orjson.loads(f.read())
             
             self.deserialize(data)
             return True
+        except FileNotFoundError:
+            return False
         except Exception as e:
             print(f"Warning: Failed to restore context: {e}")
             return False
@@ -426,43 +784,128 @@ class RedisFileContextBackend(ContextBackend):
         stored_metadata = self.redis_client.get(metadata_key)
         if stored_metadata:
             try:
-                self._metadata.update(json.loads(stored_metadata))
+                self._metadata.update(orjson.loads(stored_metadata))
             except Exception as e:
                 print(f"Warning: Failed to restore metadata from Redis: {e}")
         
-        # 尝试从文件恢复
-        if os.path.exists(self.file_path):
-            import asyncio
-            asyncio.create_task(self.restore())
-
-    async def _auto_memory_manage(self) -> None:
-        """自动内存管理"""
-        if self.get_message_count() > self.max_history_length and self.llm_interface:
-            # 创建摘要
-            summary = await self.auto_summarize()
-            
-            # 保存摘要
+        # 只有Redis中没有消息时才从文件恢复：文件是延迟写入的，Redis中已有的消息总是更新，
+        # 用旧快照覆盖会丢失最近的消息。恢复在构造时同步完成，调用方拿到对象时数据已就绪，
+        # 不会与构造后立即写入的消息竞争（快照受 max_history_length 限制，读取开销很小）
+        if self.redis_client.llen(self._get_redis_key("messages")) == 0:
+            self._restore_sync()
+
+    async def _auto_memory_manage(self, message_count: int) -> None:
+        """
+        自动内存管理（调用方需持有 _write_lock）
+
+        Args:
+            message_count: 刚写入消息后Redis列表的长度
+        """
+        if not self.llm_interface or not self._needs_summary(message_count):
+            return
+
+        messages = await asyncio.to_thread(self._snapshot_messages)
+        if not messages:
+            return
+        # 未超出条数上限说明是因token超出预算触发
+        over_budget = len(messages) <= self.max_history_length
+
+        # 只总结较早的消息，最近的消息原样保留，使其在后续请求中仍构成可缓存的前缀；
+        # 因token超出预算触发时只保留最近一条，避免保留的消息再次超出预算
+        keep = 1 if over_budget else max(1, min(self.keep_recent, self.max_history_length // 2))
+        older = messages[:-keep]
+
+        # 创建摘要（等待LLM期间不持有任何线程锁）
+        summary = await self._summarize_messages(older)
+
+        # 保存摘要，并只移除已被总结的最旧消息
+        await asyncio.to_thread(self._apply_summary_sync, summary, len(older))
+
+    def _apply_summary_sync(self, summary: str, summarized_count: int) -> None:
+        """把新摘要追加到已有摘要之后，并移除已被总结的消息"""
+        with self._lock:
             current_summary = self.get_summary()
             if current_summary:
                 self.update_summary(f"{current_summary}\n\n{summary}")
             else:
                 self.update_summary(summary)
-            
-            # 保留最近的一条消息
-            messages = self.retrieve_messages()
-            if messages:
-                self.clear_messages(keep_summary=True)
-                await self.store_message(messages[-1])
+            self._drop_oldest_messages(summarized_count)
+
+    def _needs_summary(self, message_count: int) -> bool:
+        """
+        是否需要总结历史
+
+        超出条数上限（即将被ltrim裁剪）或估算token数超出预算时都需要总结；
+        只剩一条消息时总结后仍会保留它，此时不再按token预算触发，避免反复总结
+        """
+        if message_count > self.max_history_length:
+            return True
+        return message_count > 1 and 0 < self.token_threshold < self._token_estimate
+
+    def _drop_oldest_messages(self, count: int) -> None:
+        """
+        从Redis列表中移除最旧的count条消息
+
+        Args:
+            count: 要移除的消息数量
+        """
+        if count <= 0:
+            return
+        with self._lock:
+            messages_key = self._get_redis_key("messages")
+            # 列表中最新的消息在前，保留头部的 (长度 - count) 条
+            remaining = max(self.get_message_count() - count, 0)
+            if remaining:
+                self.redis_client.ltrim(messages_key, 0, remaining - 1)
+            else:
+                self.redis_client.delete(messages_key)
+
+            # 消息缓存直接丢弃最旧的count条；其余增量缓存在下次读取或写入时从Redis重建
+            if self._message_cache is not None:
+                for _ in range(min(count, len(self._message_cache))):
+                    self._message_cache.popleft()
+            self._formatted_cache = None
+            self._lower_cache = None
+            self._token_counts = None
+            self._token_estimate = 0
+            self._version += 1
 
     @override
     async def auto_summarize(self) -> str:
-        """自动总结历史记录"""
+        """自动总结历史记录（相同历史的总结结果缓存在Redis中，跨会话复用）"""
+        messages = await asyncio.to_thread(self._snapshot_messages)
+        return await self._summarize_messages(messages)
+
+    async def _summarize_messages(self, messages: List[Message]) -> str:
+        """总结给定的消息列表，结果按消息内容缓存在Redis中"""
         if self._summarize_func:
-            messages = self.retrieve_messages()
-            return await self._summarize_func(messages)
+            # 只把 "role: 内容" 形式的紧凑文本交给总结模型，省去逐条序列化的冗余字段
+            history = _compact_for_summary(messages)
+            cache_key = self._summary_cache_key(history)
+            try:
+                cached = await asyncio.to_thread(self.redis_client.get, cache_key)
+            except Exception as e:
+                print(f"Warning: Failed to read summary cache: {e}")
+                cached = None
+            if cached:
+                return cached
+
+            summary = await self._summarize_func(history)
+            if summary and self.summary_cache_ttl > 0:
+                try:
+                    await asyncio.to_thread(
+                        self.redis_client.set, cache_key, summary, ex=self.summary_cache_ttl
+                    )
+                except Exception as e:
+                    print(f"Warning: Failed to write summary cache: {e}")
+            return summary
         else:
-            count = self.get_message_count()
-            return f"对话包含 {count} 条消息。"
+            return f"对话包含 {len(messages)} 条消息。"
+
+    @staticmethod
+    def _summary_cache_key(history: str) -> str:
+        """根据交给总结模型的紧凑历史生成总结缓存的键（不含时间戳，相同内容的历史共享结果）"""
+        return f"context_summary_cache:{hashlib.sha256(history.encode('utf-8')).hexdigest()}"
 
     @override
     def get_context_for_llm(self) -> str:
@@ -475,7 +918,7 @@ class RedisFileContextBackend(ContextBackend):
             context_parts.append(f"对话摘要：\n{summary}\n")
         
         # 添加最近的历史记录
-        messages = self.retrieve_messages()
+        messages = self._snapshot_messages()
         if messages:
             context_parts.append("最近的对话历史：")
             for message in messages:
@@ -487,7 +930,7 @@ class RedisFileContextBackend(ContextBackend):
         return "\n".join(context_parts)
 
     @staticmethod
-    async def _summarize_history_impl(messages: List[Message]) -> str:  # type: ignore
+    async def _summarize_history_impl(history: str) -> str:  # type: ignore
         """
         请根据以下对话历史，提取并总结关键信息。要求如下：
 
@@ -526,7 +969,7 @@ class RedisFileContextBackend(ContextBackend):
 
         请确保总结内容准确、结构清晰，便于后续检索和上下文恢复。
         Args:
-            messages: 消息列表
+            history: 对话历史，每行一条，格式为 "角色: 内容"
         Returns:
             str: 总结后的对话历史
         """
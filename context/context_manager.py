@@ -1,12 +1,12 @@
 import os
-import json
+import orjson
 import uuid
 import threading
 from typing import Dict, Optional, List, Type, Any, Literal
 from datetime import datetime
 from SimpleLLMFunc import OpenAICompatible
 from context.schemas import Message
-from context.context import ContextBackend, RedisFileContextBackend
+from context.context import ContextBackend, RedisFileContextBackend, metadata_sidecar_path
 from config.config import get_config
 from SimpleLLMFunc.logger import push_warning, app_log
 
@@ -22,17 +22,8 @@ class ContextManager:
     4. 支持可插拔的后端实现
     """
 
-    _instance = None
-    _lock: threading.Lock = threading.Lock()
-
-    def __new__(cls, backend_class: Type[ContextBackend] = RedisFileContextBackend):
-        """单例模式实现"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(ContextManager, cls).__new__(cls)
-                    cls._instance.backend_class = backend_class
-        return cls._instance
+    # 上下文ID锁的数量
+    _ID_LOCK_STRIPES = 64
 
     def __init__(self, backend_class: Type[ContextBackend]):
         """
@@ -41,11 +32,12 @@ class ContextManager:
         Args:
             backend_class: 后端实现类，默认为RedisFileBackend
         """
-        # 防止重复初始化
-        if hasattr(self, "_initialized"):
-            return
-
         self.backend_class = backend_class
+        # 按上下文ID散列到固定数量的锁上，只串行化同一ID（及少量碰撞ID）的创建/加载/删除；
+        # 锁的数量固定，不会随上下文ID增长，已存在的上下文无锁读取
+        self._id_locks: List[threading.Lock] = [
+            threading.Lock() for _ in range(self._ID_LOCK_STRIPES)
+        ]
         self.config = get_config()
         self.context_dir = self.config.CONTEXT_DIR
         self._active_contexts: Dict[str, ContextBackend] = {}
@@ -53,7 +45,9 @@ class ContextManager:
         # 确保目录存在
         os.makedirs(self.context_dir, exist_ok=True)
 
-        self._initialized = True
+    def _get_id_lock(self, context_id: str) -> threading.Lock:
+        """获取指定上下文ID对应的锁"""
+        return self._id_locks[hash(context_id) % self._ID_LOCK_STRIPES]
 
     def create_context(
         self,
@@ -76,14 +70,15 @@ class ContextManager:
         Returns:
             ContextBackend: 创建的上下文对象
         """
-        with self._lock:
-            if context_id is None:
-                context_id = str(uuid.uuid4())
+        if context_id is None:
+            context_id = str(uuid.uuid4())
 
+        with self._get_id_lock(context_id):
             # 检查是否已存在
-            if context_id in self._active_contexts:
+            existing = self._active_contexts.get(context_id)
+            if existing is not None:
                 app_log(f"Context {context_id} already exists, and is in active contexts. Returning the existing context.")
-                return self._active_contexts[context_id]
+                return existing
 
             # 生成文件路径（如果后端需要）
             if "file_path" not in backend_kwargs:
@@ -114,10 +109,16 @@ class ContextManager:
         Returns:
             ContextBackend: 上下文对象，如果不存在则返回None
         """
-        with self._lock:
-            # 先检查活动上下文
-            if context_id in self._active_contexts:
-                return self._active_contexts[context_id]
+        # 先无锁检查活动上下文（dict.get 在GIL下是原子的）
+        context = self._active_contexts.get(context_id)
+        if context is not None:
+            return context
+
+        with self._get_id_lock(context_id):
+            # 等待锁期间可能已被其他线程加载
+            context = self._active_contexts.get(context_id)
+            if context is not None:
+                return context
 
             # 尝试从文件加载（如果后端支持）
             context_file = os.path.join(self.context_dir, f"ctx_{context_id}.json")
@@ -146,22 +147,26 @@ class ContextManager:
         Returns:
             bool: 是否成功删除
         """
-        with self._lock:
+        with self._get_id_lock(context_id):
             success = False
 
             # 从活动上下文中移除
-            if context_id in self._active_contexts:
-                del self._active_contexts[context_id]
+            if self._active_contexts.pop(context_id, None) is not None:
                 success = True
 
             # 删除文件（如果存在）
             context_file = os.path.join(self.context_dir, f"ctx_{context_id}.json")
-            if os.path.exists(context_file):
-                try:
-                    os.remove(context_file)
-                    success = True
-                except Exception as e:
-                    print(f"Warning: Failed to delete context file {context_file}: {e}")
+            try:
+                os.remove(context_file)
+                success = True
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Warning: Failed to delete context file {context_file}: {e}")
+            try:
+                os.remove(metadata_sidecar_path(context_file))
+            except OSError:
+                pass
 
             return success
 
@@ -177,7 +182,11 @@ class ContextManager:
         # 扫描文件系统中的上下文文件
         try:
             for filename in os.listdir(self.context_dir):
-                if filename.startswith("ctx_") and filename.endswith(".json"):
+                if (
+                    filename.startswith("ctx_")
+                    and filename.endswith(".json")
+                    and not filename.endswith(".meta.json")
+                ):
                     context_id = filename[4:-5]  # 移除 "ctx_" 前缀和 ".json" 后缀
 
                     context_info = {
@@ -190,18 +199,22 @@ class ContextManager:
                     try:
                         file_path = context_info["file_path"]
                         if isinstance(file_path, str):
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                data = json.load(f)
-                                metadata = data.get("metadata", {})
-                                context_info.update(
-                                    {
-                                        "start_time": metadata.get("start_time"),
-                                        "last_activity": metadata.get("last_activity"),
-                                        "total_messages": metadata.get(
-                                            "total_messages", 0
-                                        ),
-                                    }
-                                )
+                            # 优先读取只含元数据的小文件，旧快照没有该文件时再解析整个快照
+                            try:
+                                with open(metadata_sidecar_path(file_path), "rb") as f:
+                                    metadata = orjson.loads(f.read())
+                            except FileNotFoundError:
+                                with open(file_path, "rb") as f:
+                                    metadata = orjson.loads(f.read()).get("metadata", {})
+                            context_info.update(
+                                {
+                                    "start_time": metadata.get("start_time"),
+                                    "last_activity": metadata.get("last_activity"),
+                                    "total_messages": metadata.get(
+                                        "total_messages", 0
+                                    ),
+                                }
+                            )
                     except Exception:
                         pass  # 忽略读取错误
 
@@ -222,15 +235,14 @@ class ContextManager:
         Returns:
             bool: 是否成功保存
         """
-        with self._lock:
-            if context_id in self._active_contexts:
-                try:
-                    context = self._active_contexts[context_id]
-                    return await context.persist()
-                except Exception as e:
-                    print(f"Warning: Failed to save context {context_id}: {e}")
+        context = self._active_contexts.get(context_id)
+        if context is not None:
+            try:
+                return await context.persist()
+            except Exception as e:
+                print(f"Warning: Failed to save context {context_id}: {e}")
 
-            return False
+        return False
 
     async def save_all_contexts(self) -> int:
         """
@@ -240,10 +252,9 @@ class ContextManager:
             int: 成功保存的上下文数量
         """
         saved_count = 0
-        with self._lock:
-            for context_id in list(self._active_contexts.keys()):
-                if await self.save_context(context_id):
-                    saved_count += 1
+        for context_id in list(self._active_contexts.keys()):
+            if await self.save_context(context_id):
+                saved_count += 1
 
         return saved_count
 
@@ -260,30 +271,24 @@ class ContextManager:
         cleaned_count = 0
         current_time = datetime.now()
 
-        with self._lock:
-            contexts_to_remove = []
-
-            for context_id, context in self._active_contexts.items():
-                try:
-                    metadata = context.get_metadata()
-                    last_activity_str = metadata.get("last_activity")
-                    if last_activity_str:
-                        last_activity = datetime.fromisoformat(last_activity_str)
-                        inactive_time = (current_time - last_activity).total_seconds()
-
-                        if inactive_time > max_inactive_time:
-                            # 保存上下文后移除
-                            await context.persist()
-                            contexts_to_remove.append(context_id)
-                            cleaned_count += 1
-                except Exception as e:
-                    print(
-                        f"Warning: Error checking activity for context {context_id}: {e}"
-                    )
-
-            # 移除非活动上下文
-            for context_id in contexts_to_remove:
-                del self._active_contexts[context_id]
+        # 遍历快照，await 期间其他协程增删上下文不影响迭代
+        for context_id, context in list(self._active_contexts.items()):
+            try:
+                metadata = context.get_metadata()
+                last_activity_str = metadata.get("last_activity")
+                if last_activity_str:
+                    last_activity = datetime.fromisoformat(last_activity_str)
+                    inactive_time = (current_time - last_activity).total_seconds()
+
+                    if inactive_time > max_inactive_time:
+                        # 保存上下文后移除
+                        await context.persist()
+                        self._active_contexts.pop(context_id, None)
+                        cleaned_count += 1
+            except Exception as e:
+                print(
+                    f"Warning: Error checking activity for context {context_id}: {e}"
+                )
 
         return cleaned_count
 
@@ -353,53 +358,62 @@ class ContextManager:
 
 # 全局实例
 _global_context_manager: Optional[ContextManager] = None
+_global_context_manager_lock = threading.Lock()
 
 
 def get_context_manager() -> ContextManager:
-    """获取全局 ContextManager 实例"""
+    """获取全局 ContextManager 实例（已创建时无需加锁）"""
     global _global_context_manager
     if _global_context_manager is None:
-        # 从config获取Redis配置
-        config = get_config()
-
-        # redis config
-        redis_host = config.REDIS_HOST
-        redis_port = int(config.REDIS_PORT)
-        redis_db = int(config.REDIS_DB)
-
-        # 创建自定义backend类，预配置Redis参数
-        class ConfiguredRedisFileBackend(RedisFileContextBackend):
-            def __init__(
-                self,
-                context_id: str,
-                llm_interface: Optional[
-                    OpenAICompatible
-                ] = config.CONTEXT_SUMMARY_INTERFACE,
-                max_history_length: int = config.CONTEXT_MAX_HISTORY_LENGTH,
-                redis_host: str = redis_host,
-                redis_port: int = redis_port,
-                redis_db: int = redis_db,
-                file_path: str = "",
-            ):
-                super().__init__(
-                    context_id=context_id,
-                    llm_interface=llm_interface,
-                    max_history_length=max_history_length,
-                    redis_host=redis_host,
-                    redis_port=redis_port,
-                    redis_db=redis_db,
-                    file_path=file_path,
+        with _global_context_manager_lock:
+            if _global_context_manager is None:
+                # 从config获取Redis配置
+                config = get_config()
+
+                # redis config
+                redis_host = config.REDIS_HOST
+                redis_port = int(config.REDIS_PORT)
+                redis_db = int(config.REDIS_DB)
+
+                # 创建自定义backend类，预配置Redis参数
+                class ConfiguredRedisFileBackend(RedisFileContextBackend):
+                    def __init__(
+                        self,
+                        context_id: str,
+                        llm_interface: Optional[
+                            OpenAICompatible
+                        ] = config.CONTEXT_SUMMARY_INTERFACE,
+                        max_history_length: int = config.CONTEXT_MAX_HISTORY_LENGTH,
+                        redis_host: str = redis_host,
+                        redis_port: int = redis_port,
+                        redis_db: int = redis_db,
+                        file_path: str = "",
+                        summary_cache_ttl: int = config.CONTEXT_SUMMARY_CACHE_TTL,
+                        token_threshold: int = config.CONTEXT_TOKEN_THRESHOLD,
+                        keep_recent: int = config.CONTEXT_KEEP_RECENT,
+                    ):
+                        super().__init__(
+                            context_id=context_id,
+                            llm_interface=llm_interface,
+                            max_history_length=max_history_length,
+                            redis_host=redis_host,
+                            redis_port=redis_port,
+                            redis_db=redis_db,
+                            file_path=file_path,
+                            summary_cache_ttl=summary_cache_ttl,
+                            token_threshold=token_threshold,
+                            keep_recent=keep_recent,
+                        )
+                        self.file_path = file_path
+                        self.context_id = context_id
+                        self.llm_interface = llm_interface
+                        self.max_history_length = max_history_length
+                        self.redis_host = redis_host
+                        self.redis_port = redis_port
+                        self.redis_db = redis_db
+
+                # 使用配置好的backend类创建ContextManager
+                _global_context_manager = ContextManager(
+                    backend_class=ConfiguredRedisFileBackend
                 )
-                self.file_path = file_path
-                self.context_id = context_id
-                self.llm_interface = llm_interface
-                self.max_history_length = max_history_length
-                self.redis_host = redis_host
-                self.redis_port = redis_port
-                self.redis_db = redis_db
-
-        # 使用配置好的backend类创建ContextManager
-        _global_context_manager = ContextManager(
-            backend_class=ConfiguredRedisFileBackend
-        )
     return _global_context_manager
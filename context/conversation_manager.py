@@ -1,5 +1,6 @@
 from __future__ import annotations  
 import uuid
+import asyncio
 import threading
 import os
 from typing import Dict, Optional, List, Any
@@ -22,9 +23,8 @@ _conversation_context_lock = threading.RLock()
 
 def get_current_conversation() -> Optional[Conversation]:
     """获取当前上下文中的Conversation"""
-    global _current_conversation
-    with _conversation_context_lock:
-        return _current_conversation
+    # 读取模块全局变量是原子操作，热路径上无需加锁；锁只用于保证进入/退出时的检查与赋值一致
+    return _current_conversation
 
 
 def get_current_context() -> Optional[ContextBackend]:
@@ -39,7 +39,7 @@ def get_current_sketch_pad() -> Optional[SketchPadBackend]:
     return conversation.sketch_pad if conversation else None
 
 
-@dataclass
+@dataclass(slots=True)
 class Conversation:
     """
     Conversation 数据类，表示一个完整的对话会话
@@ -83,23 +83,8 @@ class ConversationManager:
     来管理底层的 Context 和 SketchPad 对象。
     """
     
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls):
-        """单例模式实现"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(ConversationManager, cls).__new__(cls)
-        return cls._instance
-    
     def __init__(self):
         """初始化 ConversationManager"""
-        # 防止重复初始化
-        if hasattr(self, '_initialized'):
-            return
-        
         self.config = get_config()
         self.context_manager: ContextManager = get_context_manager()
         self.sketch_manager: SketchManager = get_sketch_manager()
@@ -109,8 +94,6 @@ class ConversationManager:
         # 创建conversations目录
         self.conversations_dir = os.path.join(os.path.dirname(self.config.CONTEXT_DIR), "conversations")
         os.makedirs(self.conversations_dir, exist_ok=True)
-        
-        self._initialized = True
     
     def create_conversation(
         self,
@@ -314,21 +297,26 @@ class ConversationManager:
             bool: 是否成功保存
         """
         with self._lock:
-            if conversation_id in self._active_conversations:
-                try:
-                    conversation = self._active_conversations[conversation_id]
-                    
-                    # 保存 Context
-                    context_saved = await conversation.context.persist()
-                    
-                    # 保存 SketchPad
-                    conversation.sketch_pad.persist()
-                    sketch_saved = True
-                    
-                    return bool(context_saved and sketch_saved)
-                except Exception as e:
-                    push_warning(f"Failed to save conversation {conversation_id}: {e}")
-            
+            conversation = self._active_conversations.get(conversation_id)
+        if conversation is None:
+            return False
+        return await self._persist_conversation(conversation)
+
+    async def _persist_conversation(self, conversation: Conversation) -> bool:
+        """
+        持久化单个 Conversation（调用方不得持有 _lock：写文件期间不阻塞其他线程，
+        SketchPad 的同步持久化在线程中执行，不阻塞事件循环）
+        """
+        try:
+            # 保存 Context
+            context_saved = await conversation.context.persist()
+
+            # 保存 SketchPad
+            await asyncio.to_thread(conversation.sketch_pad.persist)
+
+            return bool(context_saved)
+        except Exception as e:
+            push_warning(f"Failed to save conversation {conversation.uuid}: {e}")
             return False
     
     async def save_all_conversations(self) -> int:
@@ -338,11 +326,14 @@ class ConversationManager:
         Returns:
             int: 成功保存的 Conversation 数量
         """
-        saved_count = 0
+        # 只在锁内取快照，逐个落盘时不持有锁
         with self._lock:
-            for conversation_id in list(self._active_conversations.keys()):
-                if await self.save_conversation(conversation_id):
-                    saved_count += 1
+            conversations = list(self._active_conversations.values())
+
+        saved_count = 0
+        for conversation in conversations:
+            if await self._persist_conversation(conversation):
+                saved_count += 1
         
         return saved_count
     
@@ -359,24 +350,27 @@ class ConversationManager:
         cleaned_count = 0
         current_time = datetime.now()
         
+        # 只在锁内挑出非活动 Conversation，落盘时不持有锁
         with self._lock:
-            conversations_to_remove = []
-            
+            inactive_conversations = []
             for conversation_id, conversation in self._active_conversations.items():
                 try:
                     inactive_time = (current_time - conversation.last_accessed).total_seconds()
-                    
                     if inactive_time > max_inactive_time:
-                        # 保存 Conversation 后移除
-                        await self.save_conversation(conversation_id)
-                        conversations_to_remove.append(conversation_id)
-                        cleaned_count += 1
+                        inactive_conversations.append(conversation)
                 except Exception as e:
                     push_warning(f"Error checking activity for conversation {conversation_id}: {e}")
-            
-            # 移除非活动 Conversation
-            for conversation_id in conversations_to_remove:
-                del self._active_conversations[conversation_id]
+
+        for conversation in inactive_conversations:
+            # 保存 Conversation 后移除；落盘期间被重新访问的 Conversation 保留
+            await self._persist_conversation(conversation)
+            with self._lock:
+                if (
+                    self._active_conversations.get(conversation.uuid) is conversation
+                    and (current_time - conversation.last_accessed).total_seconds() > max_inactive_time
+                ):
+                    del self._active_conversations[conversation.uuid]
+                    cleaned_count += 1
         
         return cleaned_count
     
@@ -397,10 +391,13 @@ class ConversationManager:
 
 # 全局实例
 _global_conversation_manager: Optional[ConversationManager] = None
+_global_conversation_manager_lock = threading.Lock()
 
 def get_conversation_manager() -> ConversationManager:
-    """获取全局 ConversationManager 实例"""
+    """获取全局 ConversationManager 实例（已创建时无需加锁）"""
     global _global_conversation_manager
     if _global_conversation_manager is None:
-        _global_conversation_manager = ConversationManager()
+        with _global_conversation_manager_lock:
+            if _global_conversation_manager is None:
+                _global_conversation_manager = ConversationManager()
     return _global_conversation_manager
\ No newline at end of file
@@ -0,0 +1,20 @@
+from functools import lru_cache
+import redis
+
+
+@lru_cache(maxsize=None)
+def get_redis_pool(
+    host: str, port: int, db: int, decode_responses: bool = False
+) -> redis.ConnectionPool:
+    """
+    获取共享的Redis连接池
+
+    同一 (host, port, db, decode_responses) 只创建一个连接池，所有上下文与SketchPad
+    后端共用其中的连接，新建后端时无需各自建立TCP连接。
+    """
+    return redis.ConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        decode_responses=decode_responses,
+    )
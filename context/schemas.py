@@ -89,6 +89,23 @@ class ChatMessages(RootModel[List[Message]]):
     """按时间顺序排列的聊天消息列表"""
 
 
+# 预览中控制字符的转义表，保证预览始终为单行
+_PREVIEW_ESCAPE_TABLE = str.maketrans({"\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+
+def make_value_preview(value: Any, limit: int = 100) -> str:
+    """生成值的单行截断预览，超出limit的部分以"..."表示"""
+    if value is None:
+        return ""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        # 二进制内容不做str()，只描述长度和前4KB的哈希，避免为大文件生成完整repr
+        head = bytes(value[:4096])
+        return f"<bytes len={len(value)} sha1={hashlib.sha1(head).hexdigest()[:8]}>"
+    text = value if isinstance(value, str) else str(value)
+    preview = text[:limit].translate(_PREVIEW_ESCAPE_TABLE)
+    return preview + "..." if len(text) > limit else preview
+
+
 class SketchPadItem(BaseModel):
     """SketchPad 存储项的数据结构"""
     
@@ -101,6 +118,7 @@ class SketchPadItem(BaseModel):
     tags: Set[str] = Field(default_factory=set, description="标签集合")
     content_type: str = Field(default="text", description="内容类型")
     content_hash: Optional[str] = Field(default=None, description="内容哈希值")
+    preview: Optional[str] = Field(default=None, description="值的截断预览（写入时生成）")
 
     @field_validator('last_accessed', mode='before')
     @classmethod
@@ -144,6 +162,7 @@ class SketchPadItem(BaseModel):
             "tags": list(self.tags),
             "content_type": self.content_type,
             "content_hash": self.content_hash,
+            "preview": self.preview,
         }
 
     @classmethod
@@ -199,4 +218,5 @@ class SketchPadListItem(BaseModel):
     content_type: str = Field(..., description="内容类型")
     access_count: int = Field(..., description="访问次数")
     content_hash: Optional[str] = Field(default=None, description="内容哈希值")
+    preview: str = Field(default="", description="值的截断预览")
     value: Optional[Any] = Field(default=None, description="项目值（仅在包含内容时）")
@@ -1,5 +1,5 @@
 import os
-import json
+import orjson
 import uuid
 import threading
 from typing import Dict, Optional, List, Type, Any
@@ -21,18 +21,6 @@ class SketchManager:
     4. 支持可插拔的后端实现
     """
 
-    _instance = None
-    _lock: threading.Lock = threading.Lock()
-
-    def __new__(cls, backend_class: Type[SketchPadBackend] = RedisFileSketchPadBackend):
-        """单例模式实现"""
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(SketchManager, cls).__new__(cls)
-                    cls._instance.backend_class = backend_class
-        return cls._instance
-
     def __init__(self, backend_class: Type[SketchPadBackend]):
         """
         初始化SketchPad管理器
@@ -40,11 +28,8 @@ class SketchManager:
         Args:
             backend_class: 后端实现类，默认为RedisFileSketchPadBackend
         """
-        # 防止重复初始化
-        if hasattr(self, "_initialized"):
-            return
-
         self.backend_class = backend_class
+        self._lock = threading.Lock()
         self.config = get_config()
         self.sketch_dir = self.config.SKETCH_DIR
         self._active_sketches: Dict[str, SketchPadBackend] = {}
@@ -52,8 +37,6 @@ class SketchManager:
         # 确保目录存在
         os.makedirs(self.sketch_dir, exist_ok=True)
 
-        self._initialized = True
-
     def create_sketch_pad(
         self,
         sketch_id: Optional[str] = None,
@@ -143,12 +126,13 @@ class SketchManager:
 
             # 删除文件（如果存在）
             sketch_file = os.path.join(self.sketch_dir, f"skt_{sketch_id}.json")
-            if os.path.exists(sketch_file):
-                try:
-                    os.remove(sketch_file)
-                    success = True
-                except Exception as e:
-                    print(f"Warning: Failed to delete sketch file {sketch_file}: {e}")
+            try:
+                os.remove(sketch_file)
+                success = True
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Warning: Failed to delete sketch file {sketch_file}: {e}")
 
             return success
 
@@ -177,8 +161,8 @@ class SketchManager:
                     try:
                         file_path = sketch_info["file_path"]
                         if isinstance(file_path, str):
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                data = json.load(f)
+                            with open(file_path, "rb") as f:
+                                data = orjson.loads(f.read())
                                 sketch_info.update({
                                     "total_items": len(data.get("items", {})),
                                     "last_saved": data.get("serialization_timestamp"),
@@ -418,13 +402,16 @@ class SketchManager:
             print(f"Warning: Failed to get statistics: {e}")
             return None
 
-    def list_items(self, sketch_id: str, include_value: bool = False) -> List[Any]:
+    def list_items(
+        self, sketch_id: str, include_value: bool = False, limit: Optional[int] = None
+    ) -> List[Any]:
         """
         列出所有项目
 
         Args:
             sketch_id: SketchPad ID
             include_value: 是否包含值
+            limit: 最多返回的项目数，None表示不限制
 
         Returns:
             List[Any]: 项目列表
@@ -434,7 +421,7 @@ class SketchManager:
             return []
 
         try:
-            return sketch_pad.list_items(include_value)
+            return sketch_pad.list_items(include_value, limit)
         except Exception as e:
             print(f"Warning: Failed to list items: {e}")
             return []
@@ -442,40 +429,43 @@ class SketchManager:
 
 # 全局实例
 _global_sketch_manager: Optional[SketchManager] = None
+_global_sketch_manager_lock = threading.Lock()
 
 
 def get_sketch_manager() -> SketchManager:
-    """获取全局SketchManager实例"""
+    """获取全局SketchManager实例（已创建时无需加锁）"""
     global _global_sketch_manager
     if _global_sketch_manager is None:
-        # 从config获取Redis配置
-        config = get_config()
-
-        # redis config
-        redis_host = config.REDIS_HOST
-        redis_port = int(config.REDIS_PORT)
-        redis_db = int(config.REDIS_DB)
-
-        # 创建自定义backend类，预配置Redis参数
-        class ConfiguredRedisFileSketchPadBackend(RedisFileSketchPadBackend):
-            def __init__(
-                self,
-                sketch_pad_id: str,
-                redis_host: str = redis_host,
-                redis_port: int = redis_port,
-                redis_db: int = redis_db,
-                file_path: Optional[str] = None,
-            ):
-                super().__init__(
-                    sketch_pad_id=sketch_pad_id,
-                    redis_host=redis_host,
-                    redis_port=redis_port,
-                    redis_db=redis_db,
-                    file_path=file_path,
+        with _global_sketch_manager_lock:
+            if _global_sketch_manager is None:
+                # 从config获取Redis配置
+                config = get_config()
+
+                # redis config
+                redis_host = config.REDIS_HOST
+                redis_port = int(config.REDIS_PORT)
+                redis_db = int(config.REDIS_DB)
+
+                # 创建自定义backend类，预配置Redis参数
+                class ConfiguredRedisFileSketchPadBackend(RedisFileSketchPadBackend):
+                    def __init__(
+                        self,
+                        sketch_pad_id: str,
+                        redis_host: str = redis_host,
+                        redis_port: int = redis_port,
+                        redis_db: int = redis_db,
+                        file_path: Optional[str] = None,
+                    ):
+                        super().__init__(
+                            sketch_pad_id=sketch_pad_id,
+                            redis_host=redis_host,
+                            redis_port=redis_port,
+                            redis_db=redis_db,
+                            file_path=file_path,
+                        )
+
+                # 使用配置好的backend类创建SketchManager
+                _global_sketch_manager = SketchManager(
+                    backend_class=ConfiguredRedisFileSketchPadBackend
                 )
-
-        # 使用配置好的backend类创建SketchManager
-        _global_sketch_manager = SketchManager(
-            backend_class=ConfiguredRedisFileSketchPadBackend
-        )
     return _global_sketch_manager
\ No newline at end of file
@@ -3,14 +3,27 @@ from typing import Any, Dict, List, Optional, Union, Set, Tuple, override, cast
 from datetime import datetime, timedelta
 import threading
 import json
+import orjson
 import os
 import hashlib
+import heapq
+import time
 from context.schemas import (
     SketchPadItem,
     SketchPadStatistics,
     SketchPadListItem,
+    make_value_preview,
 )
 from redis import Redis
+from context.redis_pool import get_redis_pool
+
+
+def _json_default(obj: Any) -> Any:
+    """orjson 无法直接序列化的对象：集合转为列表，其余转为字符串"""
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
+
 
 class SketchPadBackend(ABC):
     """
@@ -127,10 +140,26 @@ class SketchPadBackend(ABC):
         pass
 
     @abstractmethod
-    def list_items(self, include_value: bool = False) -> List[SketchPadListItem]:
-        """列出所有项目"""
+    def list_items(
+        self, include_value: bool = False, limit: Optional[int] = None
+    ) -> List[SketchPadListItem]:
+        """列出项目，limit不为None时最多返回limit个"""
         pass
 
+    def count_items(self) -> int:
+        """获取项目总数（后端可重写为无需加载项目内容的实现）"""
+        return len(self.list_items())
+
+    @property
+    def version(self) -> Optional[int]:
+        """
+        内容版本号，任何写入、删除、清空或过期都会使其变化
+
+        调用方可以用它判断基于SketchPad内容计算的缓存是否仍然有效；
+        返回None表示该后端不跟踪版本，调用方不应缓存。
+        """
+        return None
+
 
 class RedisFileSketchPadBackend(SketchPadBackend):
     """
@@ -168,11 +197,36 @@ class RedisFileSketchPadBackend(SketchPadBackend):
         self.redis_host = redis_host
         self.redis_port = redis_port
         self.redis_db = redis_db
-        self.redis: Redis = Redis(host=self.redis_host, port=self.redis_port, db=self.redis_db)
+        self.redis: Redis = Redis(
+            connection_pool=get_redis_pool(self.redis_host, self.redis_port, self.redis_db)
+        )
 
         self._lock = threading.RLock()
+        # 内容版本号与待过期时间点（最小堆），用于让上层缓存感知内容变化
+        self._version = 0
+        self._expiry_heap: List[float] = []
+        # 最近一次写入文件时的内容版本号
+        self._persisted_version: Optional[int] = None
         self._restore_from_storage()
 
+    def _bump_version(self) -> None:
+        """内容发生变化时递增版本号（调用方需持有锁）"""
+        self._version += 1
+
+    @property
+    @override
+    def version(self) -> Optional[int]:
+        """内容版本号，已到期的TTL项目也会使版本号变化"""
+        with self._lock:
+            now = time.time()
+            expired = False
+            while self._expiry_heap and self._expiry_heap[0] <= now:
+                heapq.heappop(self._expiry_heap)
+                expired = True
+            if expired:
+                self._bump_version()
+            return self._version
+
     # ---- Redis typed helpers (to avoid Awaitable union types in stubs) ----
     def _redis_get(self, key: str) -> Optional[bytes]:
         raw = cast(Any, self.redis.get(key))
@@ -199,13 +253,14 @@ class RedisFileSketchPadBackend(SketchPadBackend):
         with self._lock:
             if self.file_path is None:
                 return
-            if os.path.exists(self.file_path):
-                try:
-                    with open(self.file_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                    self.deserialize(data)
-                except Exception as e:
-                    print(f"Warning: Failed to restore from file: {e}")
+            try:
+                with open(self.file_path, "rb") as f:
+                    data = orjson.loads(f.read())
+                self.deserialize(data)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"Warning: Failed to restore from file: {e}")
 
     def _get_redis_key(self, key: str) -> str:
         """获取Redis键名"""
@@ -236,31 +291,39 @@ class RedisFileSketchPadBackend(SketchPadBackend):
             tags: 标签
         """
         with self._lock:
-            # 创建SketchPadItem
+            # 创建SketchPadItem，创建时间与过期时间基于同一时刻
+            now = datetime.now()
             item = SketchPadItem(
                 value=value,
-                timestamp=datetime.now(),
+                timestamp=now,
                 summary=summary,
                 tags=tags or set(),
-                expires_at=datetime.now() + timedelta(seconds=ttl) if ttl else None,
+                expires_at=now + timedelta(seconds=ttl) if ttl else None,
                 content_hash=self._get_content_hash(value),
+                preview=make_value_preview(value),
             )
 
-            # 存储到Redis
+            # 存储到Redis：值、过期时间与标签索引通过同一个pipeline一次往返写入
             item_json = item.model_dump_json()
             redis_key = self._get_redis_key(key)
-            self.redis.set(redis_key, item_json)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(redis_key, item_json)
             
             # 设置过期时间
             if ttl:
-                self.redis.expire(redis_key, ttl)
+                pipe.expire(redis_key, ttl)
 
             # 更新标签索引
             if tags:
                 for tag in tags:
                     tag_key = self._get_redis_key(f"tag:{tag}")
-                    self.redis.sadd(tag_key, key)
+                    pipe.sadd(tag_key, key)
+
+            pipe.execute()
+            if ttl:
+                heapq.heappush(self._expiry_heap, time.time() + ttl)
 
+            self._bump_version()
             return key
 
     @override
@@ -385,6 +448,8 @@ class RedisFileSketchPadBackend(SketchPadBackend):
             # 删除主键
             redis_key = self._get_redis_key(key)
             result = self._redis_delete(redis_key)
+            if result > 0:
+                self._bump_version()
             return result > 0
 
     @override
@@ -421,6 +486,8 @@ class RedisFileSketchPadBackend(SketchPadBackend):
             # 删除所有键
             if keys:
                 self._redis_delete(*keys)
+            self._expiry_heap.clear()
+            self._bump_version()
 
     @override
     def serialize(self) -> Dict[str, Any]:
@@ -469,36 +536,44 @@ class RedisFileSketchPadBackend(SketchPadBackend):
                                 self.redis.sadd(tag_key, key)
                     except Exception as e:
                         print(f"Warning: Failed to deserialize item {key}: {e}")
+            self._bump_version()
 
     @override
     def persist(self) -> None:
-        """持久化数据"""
+        """持久化数据（内容自上次落盘后未变化时跳过）"""
         try:
+            # 序列化数据，同时记下对应的版本号
+            with self._lock:
+                version = self.version
+                if version == self._persisted_version and os.path.exists(self.file_path):
+                    return
+                data = self.serialize()
+
             # 确保目录存在
             dir_path = os.path.dirname(self.file_path)
             if dir_path:
                 os.makedirs(dir_path, exist_ok=True)
             
-            # 序列化数据
-            data = self.serialize()
-            
-            # 写入文件
-            with open(self.file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+            # 先写临时文件再原子替换，写入中途失败不会损坏已有快照
+            tmp_path = f"{self.file_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS))
+            os.replace(tmp_path, self.file_path)
+
+            self._persisted_version = version
         except Exception as e:
             print(f"Warning: Failed to persist sketch pad: {e}")
 
     @override
     def restore(self) -> None:
         """从持久化数据中恢复"""
-        if not os.path.exists(self.file_path):
-            return
-        
         try:
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            with open(self.file_path, "rb") as f:
+                data = orjson.loads(f.read())
             
             self.deserialize(data)
+        except FileNotFoundError:
+            return
         except Exception as e:
             print(f"Warning: Failed to restore sketch pad: {e}")
 
@@ -551,36 +626,69 @@ class RedisFileSketchPadBackend(SketchPadBackend):
                 memory_usage_percent=memory_usage_percent,
             )
 
-    def list_items(self, include_value: bool = False) -> List[SketchPadListItem]:
-        """列出所有项目"""
+    def _item_keys(self) -> List[str]:
+        """获取所有项目的原始键名（不含标签索引键）"""
+        keys: List[str] = []
+        for key in self._redis_keys(self._get_redis_key("*")):
+            redis_key_str: str = key.decode('utf-8')
+            # 过滤掉标签索引键
+            if ":tag:" in redis_key_str:
+                continue
+            # 提取原始键名
+            keys.append(redis_key_str.split(":", 2)[-1])
+        return keys
+
+    @override
+    def count_items(self) -> int:
+        """获取项目总数，只扫描键名"""
+        with self._lock:
+            return len(self._item_keys())
+
+    def list_items(
+        self, include_value: bool = False, limit: Optional[int] = None
+    ) -> List[SketchPadListItem]:
+        """
+        列出项目，limit不为None时只加载前limit个
+
+        只读操作：通过一次 MGET 取回存储的JSON直接构造列表项，不经过 get_item，
+        因此不会更新访问统计、回写整个项目或丢失其TTL
+        """
         with self._lock:
             items: List[SketchPadListItem] = []
-            # 获取所有键，但过滤掉标签索引键
-            pattern = self._get_redis_key("*")
-            all_keys = self._redis_keys(pattern)
-            
-            for key in all_keys:
-                redis_key_str_list_items: str = key.decode('utf-8')
-                # 过滤掉标签索引键
-                if ":tag:" in redis_key_str_list_items:
+            item_keys = self._item_keys()
+            if limit is not None:
+                item_keys = item_keys[:limit]
+            if not item_keys:
+                return items
+
+            raw_items = cast(
+                List[Optional[bytes]],
+                self.redis.mget([self._get_redis_key(key) for key in item_keys]),
+            )
+            for original_key, raw in zip(item_keys, raw_items):
+                # 扫描键名与 MGET 之间过期的项目
+                if raw is None:
                     continue
-                
-                # 提取原始键名
-                original_key = redis_key_str_list_items.split(":", 2)[-1]
-                
-                item = self.get_item(original_key)
-                if item:
-                    list_item = SketchPadListItem(
-                        key=original_key,
-                        summary=item.summary,
-                        timestamp=item.timestamp.isoformat(),
-                        tags=list(item.tags),
-                        content_type=item.content_type,
-                        access_count=item.access_count,
-                        content_hash=item.content_hash,
-                        value=item.value if include_value else None,
+                try:
+                    data = orjson.loads(raw)
+                    value = data.pop("value", None)
+                    preview = data.get("preview")
+                    items.append(
+                        SketchPadListItem(
+                            key=original_key,
+                            summary=data.get("summary"),
+                            timestamp=data["timestamp"],
+                            tags=data.get("tags") or [],
+                            content_type=data.get("content_type", "text"),
+                            access_count=data.get("access_count", 0),
+                            content_hash=data.get("content_hash"),
+                            # 旧数据没有预生成的预览时现场补算
+                            preview=preview if preview is not None else make_value_preview(value),
+                            value=value if include_value else None,
+                        )
                     )
-                    items.append(list_item)
-            
+                except Exception as e:
+                    print(f"Warning: Failed to deserialize item: {e}")
+
             return items
 
@@ -0,0 +1,89 @@
+from typing import Any, Dict, List, Optional
+
+import pytest
+import redis
+
+
+class InMemoryRedis:
+    """测试用的内存Redis，只实现上下文后端用到的命令（decode_responses=True 语义）"""
+
+    def __init__(self, store: Dict[str, Any]):
+        self._store = store
+
+    @staticmethod
+    def _decode(value: Any) -> str:
+        return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+    @staticmethod
+    def _range(length: int, start: int, end: int) -> slice:
+        if start < 0:
+            start = max(length + start, 0)
+        if end < 0:
+            end = length + end
+        return slice(start, end + 1)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._store.get(key)
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
+        self._store[key] = self._decode(value)
+        return True
+
+    def delete(self, *keys: str) -> int:
+        return sum(self._store.pop(key, None) is not None for key in keys)
+
+    def lpush(self, key: str, *values: Any) -> int:
+        items: List[str] = self._store.setdefault(key, [])
+        for value in values:
+            items.insert(0, self._decode(value))
+        return len(items)
+
+    def lrange(self, key: str, start: int, end: int) -> List[str]:
+        items = self._store.get(key, [])
+        return list(items[self._range(len(items), start, end)])
+
+    def ltrim(self, key: str, start: int, end: int) -> bool:
+        items = self._store.get(key)
+        if items is not None:
+            kept = items[self._range(len(items), start, end)]
+            if kept:
+                self._store[key] = kept
+            else:
+                del self._store[key]
+        return True
+
+    def llen(self, key: str) -> int:
+        return len(self._store.get(key, []))
+
+    def pipeline(self, transaction: bool = True) -> "InMemoryPipeline":
+        return InMemoryPipeline(self)
+
+
+class InMemoryPipeline:
+    """按顺序缓存命令，execute 时依次执行并返回各命令结果"""
+
+    def __init__(self, client: InMemoryRedis):
+        self._client = client
+        self._commands: List[Any] = []
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._client, name)
+
+        def queue(*args: Any, **kwargs: Any) -> "InMemoryPipeline":
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self) -> List[Any]:
+        results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self._commands.clear()
+        return results
+
+
+@pytest.fixture
+def redis_store(monkeypatch) -> Dict[str, Any]:
+    """让所有 redis.Redis 实例共享同一个内存存储，返回该存储以便检查或清空"""
+    store: Dict[str, Any] = {}
+    monkeypatch.setattr(redis, "Redis", lambda *args, **kwargs: InMemoryRedis(store))
+    return store
@@ -0,0 +1,101 @@
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+
+import pytest
+
+from web_interface.utils import coalesce_stream
+
+
+async def _source(pieces: List[Tuple[str, float]], error: Optional[Exception] = None) -> AsyncIterator[str]:
+    """按 (片段, 产出前等待秒数) 依次产出片段，最后可选地抛出异常"""
+    for piece, delay in pieces:
+        if delay:
+            await asyncio.sleep(delay)
+        yield piece
+    if error is not None:
+        raise error
+
+
+def _collect(source: AsyncIterator[str], interval: float, **kwargs) -> List[Tuple[str, float]]:
+    """收集合并后的输出及其相对开始时间"""
+
+    async def run() -> List[Tuple[str, float]]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        return [
+            (chunk, loop.time() - start)
+            async for chunk in coalesce_stream(source, interval, **kwargs)
+        ]
+
+    return asyncio.run(run())
+
+
+def _chunks(output: List[Tuple[str, float]]) -> List[str]:
+    return [chunk for chunk, _ in output]
+
+
+def test_non_positive_interval_passes_pieces_through():
+    output = _collect(_source([("a", 0), ("b", 0), ("c", 0)]), 0)
+    assert _chunks(output) == ["a", "b", "c"]
+
+
+def test_first_piece_is_immediate_and_burst_is_merged():
+    output = _collect(_source([("a", 0), ("b", 0), ("c", 0)]), 0.05)
+    assert _chunks(output) == ["a", "bc"]
+    assert output[0][1] < 0.05
+
+
+def test_pieces_further_apart_than_interval_are_not_delayed():
+    output = _collect(_source([("a", 0), ("b", 0.1), ("c", 0.1)]), 0.02)
+    assert _chunks(output) == ["a", "b", "c"]
+
+
+def test_pending_parts_flush_at_window_end_without_waiting_for_source():
+    # "b" 紧跟 "a" 到达，被累积到窗口末尾输出，而不是等到 0.3 秒后 "c" 到达
+    output = _collect(_source([("a", 0), ("b", 0), ("c", 0.3)]), 0.05)
+    assert _chunks(output) == ["a", "b", "c"]
+    assert output[1][1] < 0.2
+
+
+def test_max_chars_flushes_before_window_end():
+    output = _collect(_source([("xxxx", 0), ("yyyy", 0), ("zzzz", 0), ("w", 0)]), 10, max_chars=8)
+    assert _chunks(output) == ["xxxx", "yyyyzzzz", "w"]
+    # 只有最后不足max_chars的部分在流结束时输出，不需要等待10秒的窗口
+    assert output[-1][1] < 1
+
+
+def test_producer_exception_propagates_after_pending_output():
+    received: List[str] = []
+
+    async def run() -> None:
+        source = _source([("a", 0), ("b", 0)], error=ValueError("boom"))
+        async for chunk in coalesce_stream(source, 0.05):
+            received.append(chunk)
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(run())
+    assert "".join(received) == "ab"
+
+
+def test_bounded_queue_applies_backpressure_and_stops_with_consumer():
+    produced = 0
+
+    async def source() -> AsyncIterator[str]:
+        nonlocal produced
+        for _ in range(100):
+            produced += 1
+            yield "x"
+
+    async def run() -> int:
+        stream = coalesce_stream(source(), 0.01, max_pending=4)
+        await anext(stream)
+        # 消费方暂停期间，源生成器最多多产出队列容量加上阻塞在 put 上的一个片段
+        await asyncio.sleep(0.05)
+        produced_while_paused = produced
+        await stream.aclose()
+        await asyncio.sleep(0.01)
+        # 消费方退出后后台的生产任务随之结束
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
+        return produced_while_paused
+
+    assert asyncio.run(run()) <= 6
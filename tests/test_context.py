@@ -0,0 +1,116 @@
+import asyncio
+from typing import List
+
+from context.context import RedisFileContextBackend
+from context.schemas import Message
+
+
+def _make_backend(tmp_path, context_id: str = "test", **kwargs) -> RedisFileContextBackend:
+    return RedisFileContextBackend(
+        context_id=context_id,
+        file_path=str(tmp_path / f"ctx_{context_id}.json"),
+        **kwargs,
+    )
+
+
+def _store_all(backend: RedisFileContextBackend, contents: List[str]) -> None:
+    async def run() -> None:
+        for content in contents:
+            await backend.store_message(Message(role="user", content=content))
+
+    asyncio.run(run())
+
+
+def _contents(messages: List[Message]) -> List[str]:
+    return [message.content for message in messages]
+
+
+def test_store_message_trims_to_max_history_length(redis_store, tmp_path):
+    backend = _make_backend(tmp_path, max_history_length=3)
+    _store_all(backend, ["m1", "m2", "m3", "m4", "m5"])
+
+    assert _contents(backend.retrieve_messages()) == ["m3", "m4", "m5"]
+    assert backend.retrieve_messages(limit=2)[-1].content == "m5"
+    assert backend.get_message_count() == 3
+    # Redis中最新的消息在前，与缓存保持一致
+    assert len(redis_store["context:test:messages"]) == 3
+    assert backend.get_formatted_history() == [
+        {"role": "user", "content": "m3"},
+        {"role": "user", "content": "m4"},
+        {"role": "user", "content": "m5"},
+    ]
+
+
+def test_store_message_bumps_version_and_sets_timestamp(redis_store, tmp_path):
+    backend = _make_backend(tmp_path)
+    version = backend.version
+    message = Message(role="user", content="hello")
+
+    asyncio.run(backend.store_message(message))
+
+    assert backend.version != version
+    assert message.timestamp is not None
+    assert backend.retrieve_messages()[0].timestamp == message.timestamp
+
+
+def test_cached_messages_are_isolated_from_callers(redis_store, tmp_path):
+    backend = _make_backend(tmp_path)
+    message = Message(role="user", content="original")
+    asyncio.run(backend.store_message(message))
+
+    message.content = "changed by caller"
+    backend.retrieve_messages()[0].content = "changed by reader"
+
+    assert _contents(backend.retrieve_messages()) == ["original"]
+    assert _contents(backend.search_messages("original")) == ["original"]
+
+
+def test_overflow_summarizes_older_messages_and_keeps_recent(redis_store, tmp_path, monkeypatch):
+    summarized: List[str] = []
+
+    async def fake_summarize(history: str) -> str:
+        summarized.append(history)
+        return f"summary #{len(summarized)}"
+
+    monkeypatch.setattr(
+        RedisFileContextBackend,
+        "_get_summarize_func",
+        classmethod(lambda cls, llm_interface: fake_summarize),
+    )
+    backend = _make_backend(tmp_path, llm_interface=object(), max_history_length=4, keep_recent=2)
+
+    _store_all(backend, ["m1", "m2", "m3", "m4"])
+    assert summarized == []
+    assert backend.get_summary() is None
+
+    _store_all(backend, ["m5"])
+
+    # 超出上限时只总结较早的消息，最近的消息原样保留
+    assert summarized == ["user: m1\nuser: m2\nuser: m3"]
+    assert backend.get_summary() == "summary #1"
+    assert _contents(backend.retrieve_messages()) == ["m4", "m5"]
+    assert len(redis_store["context:test:messages"]) == 2
+    # total_messages 是累计写入的消息数，不随总结移除消息而减少
+    assert backend.get_metadata()["total_messages"] == 5
+
+    _store_all(backend, ["m6", "m7", "m8"])
+
+    # 新摘要追加在已有摘要之后
+    assert backend.get_summary() == "summary #1\n\nsummary #2"
+    assert _contents(backend.retrieve_messages()) == ["m7", "m8"]
+
+
+def test_restore_uses_file_only_when_redis_is_empty(redis_store, tmp_path):
+    backend = _make_backend(tmp_path)
+    _store_all(backend, ["m1", "m2"])
+    assert asyncio.run(backend.persist())
+
+    # 落盘之后写入的消息只在Redis中，重新构造时不能被旧快照覆盖
+    _store_all(backend, ["m3"])
+    reloaded = _make_backend(tmp_path)
+    assert _contents(reloaded.retrieve_messages()) == ["m1", "m2", "m3"]
+
+    # Redis被清空（如重启）后从文件快照恢复
+    redis_store.clear()
+    restored = _make_backend(tmp_path)
+    assert _contents(restored.retrieve_messages()) == ["m1", "m2"]
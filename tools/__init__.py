@@ -8,6 +8,7 @@ from .common import print_tool_output
 
 from .command_tools import (
     execute_command,
+    check_background_command,
 )
 
 # 文件操作工具
@@ -18,9 +19,20 @@ from .sketch_tools import (
     sketch_pad_operations,
 )
 
+# 默认工具集，各Agent共享同一份定义
+DEFAULT_TOOLKIT = (
+    execute_command,
+    check_background_command,
+    read_or_search_file,
+    write_file,
+    sketch_pad_operations,
+)
+
 # 为了保持向后兼容性，导出所有工具函数
 __all__ = [
+    "DEFAULT_TOOLKIT",
     "execute_command",
+    "check_background_command",
     "sketch_pad_operations",
     "print_tool_output",
     "read_or_search_file",
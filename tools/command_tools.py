@@ -1,21 +1,145 @@
+import threading
+import time
+import uuid
+import concurrent.futures
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from SimpleLLMFunc import tool
-from .common import print_tool_output, safe_asyncio_run
+from .common import print_tool_output, safe_asyncio_run, now_str
 from context.conversation_manager import get_current_sketch_pad
 
 
+class BackgroundCommandManager:
+    """
+    后台命令管理器
+
+    后台执行的命令立即返回task_id，模型可以继续推理，稍后再通过task_id取回结果。
+    已结束但一直未被取回的任务超过 finished_ttl 秒，或数量超过 max_finished 时会被淘汰。
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        finished_ttl: float = 3600.0,
+        max_finished: int = 100,
+    ):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bg-command"
+        )
+        self._tasks: Dict[str, Tuple[str, concurrent.futures.Future]] = {}
+        # task_id -> 结束时间，按结束先后排列，用于淘汰未被取回的结果
+        self._finished_at: "OrderedDict[str, float]" = OrderedDict()
+        self._finished_ttl = finished_ttl
+        self._max_finished = max_finished
+        self._lock = threading.Lock()
+
+    def submit(self, command: str) -> str:
+        """提交后台命令，返回task_id"""
+        task_id = f"bg_{uuid.uuid4().hex[:8]}"
+        # 后台任务结束时会话可能已经结束，因此不自动写入SketchPad
+        future = self._executor.submit(_run_command, command, False)
+        with self._lock:
+            self._evict_finished()
+            self._tasks[task_id] = (command, future)
+        future.add_done_callback(lambda _: self._mark_finished(task_id))
+        return task_id
+
+    def _mark_finished(self, task_id: str) -> None:
+        """记录任务结束时间（在执行线程中回调）"""
+        with self._lock:
+            if task_id in self._tasks:
+                self._finished_at[task_id] = time.monotonic()
+
+    def _evict_finished(self) -> None:
+        """淘汰过期或超出数量上限的已结束任务（调用方需持有 _lock）"""
+        now = time.monotonic()
+        finished_at = self._finished_at
+        while finished_at:
+            task_id, finished = next(iter(finished_at.items()))
+            if (
+                now - finished <= self._finished_ttl
+                and len(finished_at) <= self._max_finished
+            ):
+                break
+            finished_at.popitem(last=False)
+            self._tasks.pop(task_id, None)
+
+    def get(self, task_id: str) -> Optional[Tuple[str, concurrent.futures.Future]]:
+        """获取后台任务（命令, Future）"""
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def discard(self, task_id: str) -> None:
+        """移除已取回结果或已取消的后台任务"""
+        with self._lock:
+            self._tasks.pop(task_id, None)
+            self._finished_at.pop(task_id, None)
+
+
+_background_commands = BackgroundCommandManager()
+
+
 @tool(
     name="execute_command",
-    description="Execute a system command in shell and return the output, with automatic SketchPad integration for command history and results.",
+    description="Execute a system command in shell and return the output, with automatic SketchPad integration for command history and results. Long-running commands can run in the background.",
 )
-def execute_command(command: str, store_result: bool = True) -> str:
+def execute_command(command: str, store_result: bool = True, background: bool = False) -> str:
     """Execute a system command in shell and return the output.
 
     Args:
         command: The system command to execute, recommended commands are python <script path>
         store_result: Whether to automatically store command and result in SketchPad
+        background: Run the command in the background and return a task id immediately; use check_background_command to get the result later (results are not stored in SketchPad)
+    Returns:
+        The command output with SketchPad key information, or the background task id
+    """
+    if background:
+        task_id = _background_commands.submit(command)
+        print_tool_output("⏳ SYSTEM 后台执行命令", f"任务ID: {task_id}\n命令: {command}")
+        return (
+            f"命令已在后台开始执行，任务ID: {task_id}\n"
+            f"💡 提示: 可以继续其他工作，稍后使用 check_background_command 工具和该任务ID获取结果"
+        )
+    return _run_command(command, store_result)
+
+
+@tool(
+    name="check_background_command",
+    description="Check the status of a background command started by execute_command, return its output when finished, or cancel it if it has not started yet.",
+)
+def check_background_command(task_id: str, cancel: bool = False) -> str:
+    """Check or cancel a background command.
+
+    Args:
+        task_id: The task id returned by execute_command with background=True
+        cancel: Cancel the command if it has not started running yet
     Returns:
-        The command output with SketchPad key information
+        The command status or its output
     """
+    task = _background_commands.get(task_id)
+    if task is None:
+        return f"未找到后台任务: {task_id}"
+    command, future = task
+
+    if cancel:
+        if future.cancel():
+            _background_commands.discard(task_id)
+            return f"后台任务 {task_id} 已取消: {command}"
+        if not future.done():
+            return f"后台任务 {task_id} 已在运行，无法取消: {command}"
+
+    if not future.done():
+        return f"后台任务 {task_id} 仍在运行: {command}"
+
+    _background_commands.discard(task_id)
+    try:
+        return f"后台任务 {task_id} 已完成: {command}\n\n{future.result()}"
+    except Exception as e:
+        return f"后台任务 {task_id} 执行失败: {command}\n\n{str(e)}"
+
+
+def _run_command(command: str, store_result: bool) -> str:
+    """执行命令并（可选地）将记录写入SketchPad"""
     import subprocess
     import time
 
@@ -37,7 +161,7 @@ def execute_command(command: str, store_result: bool = True) -> str:
             "execution_time": execution_time,
             "stdout": result.stdout.strip(),
             "stderr": result.stderr.strip(),
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "timestamp": now_str(),
         }
 
         # 打印结果
@@ -191,7 +315,7 @@ def execute_command(command: str, store_result: bool = True) -> str:
                     exception_key = f"exception_{uuid.uuid4().hex[:8]}"
                     return await sketch_pad.set_item(
                         key=exception_key,
-                        value=f"Command: {command}\nException: {str(e)}\nTimestamp: {time.strftime('%Y-%m-%d %H:%M:%S')}",
+                        value=f"Command: {command}\nException: {str(e)}\nTimestamp: {now_str()}",
                         ttl=None,
                         summary=f"Command execution exception: {command}",
                         tags={"command_execution", "exception", "error"},
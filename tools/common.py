@@ -5,9 +5,32 @@
 from config.config import get_config
 import asyncio
 import concurrent.futures
+import os
+import time
 
 config = get_config()
 
+# 工具共享的线程池：在事件循环线程中调用工具时，异步操作交由其中的线程执行，
+# 避免每次调用都新建并销毁一个线程池
+_TOOL_EXECUTOR = concurrent.futures.ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 4),
+    thread_name_prefix="tool",
+)
+
+# 按秒缓存的格式化时间：(整秒时间戳, 格式化字符串)
+_now_str_cache = (0, "")
+
+
+def now_str() -> str:
+    """返回 "%Y-%m-%d %H:%M:%S" 格式的当前本地时间，同一秒内复用格式化结果"""
+    global _now_str_cache
+    now = int(time.time())
+    cached = _now_str_cache
+    if cached[0] != now:
+        cached = (now, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)))
+        _now_str_cache = cached
+    return cached[1]
+
 
 def print_tool_output(title: str, content: str, style: str = "cyan"):
     """简化版工具输出函数，使用朴素print和分割线"""
@@ -22,9 +45,8 @@ def safe_asyncio_run(coro_func, *args, **kwargs):
     try:
         loop = asyncio.get_event_loop()
         if loop.is_running():
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(asyncio.run, coro_func(*args, **kwargs))
-                return future.result(timeout=30)
+            future = _TOOL_EXECUTOR.submit(asyncio.run, coro_func(*args, **kwargs))
+            return future.result(timeout=30)
         else:
             return loop.run_until_complete(coro_func(*args, **kwargs))
     except RuntimeError:
@@ -1,6 +1,7 @@
 """
 聊天路由模块
 """
+import asyncio
 import time
 import json
 from typing import AsyncGenerator, Any
@@ -20,11 +21,13 @@ from ..utils import (
     get_agent_for_model,
     process_agent_response,
     create_chat_response,
+    coalesce_stream,
 )
 from ..error_handlers import create_error_response
 from SimpleLLMFunc.logger import app_log, push_warning, log_context, get_current_context_attribute, get_location
 from SimpleLLMFunc.llm_decorator.utils import extract_content_from_stream_response
 from agent import BaseAgent
+from config.config import get_config
 
 router = APIRouter(prefix="/v1/chat", tags=["chat"])
 
@@ -75,8 +78,8 @@ async def stream_chat_completion(
             # 流式对话完成后立即持久化conversation
             try:
                 await conversation.context.persist()
-                # 直接调用sketch_pad的persist方法
-                conversation.sketch_pad.persist()
+                # sketch_pad的persist是同步文件写入，放到线程中执行，避免阻塞事件循环
+                await asyncio.to_thread(conversation.sketch_pad.persist)
                 app_log(f"✅ Auto-saved conversation {conversation.uuid} after stream completion")
             except Exception as save_error:
                 # 保存失败不应该影响响应，但要记录日志
@@ -153,8 +156,13 @@ async def chat_completions(
 
             # 流式响应
             if request.stream:
+                config = get_config()
                 return StreamingResponse(
-                    stream_chat_completion(request, request_id, conversation, agent),
+                    coalesce_stream(
+                        stream_chat_completion(request, request_id, conversation, agent),
+                        config.STREAM_COALESCE_INTERVAL,
+                        config.STREAM_COALESCE_MAX_CHARS,
+                    ),
                     media_type="text/event-stream",
                     headers={
                         "Cache-Control": "no-cache",
@@ -35,6 +35,14 @@ async def lifespan(app: FastAPI):
 
     app_log("🔄 Shutting down SimpleAgent Web Server...")
 
+    # 上下文采用延迟持久化，退出前把所有活动会话统一落盘一次
+    if server_state.conversation_manager is not None:
+        try:
+            saved = await server_state.conversation_manager.save_all_conversations()
+            app_log(f"💾 Saved {saved} active conversations")
+        except Exception as e:
+            push_error(f"❌ Failed to save conversations on shutdown: {e}")
+
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -1,9 +1,10 @@
 """
 工具函数模块
 """
+import asyncio
 import time
 import uuid
-from typing import Tuple, Optional, Any, Union, Dict
+from typing import Tuple, Optional, Any, Union, Dict, List, AsyncIterator, AsyncGenerator
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
 
@@ -15,12 +16,7 @@ from .models import (
     ChatChoice,
 )
 from context.conversation_manager import ConversationManager, Conversation
-from tools import (
-    execute_command,
-    read_or_search_file,
-    write_file,
-    sketch_pad_operations,
-)
+from tools import DEFAULT_TOOLKIT
 from SimpleLLMFunc.logger import app_log, push_warning, push_error, get_current_context_attribute
 from SimpleLLMFunc.llm_decorator.utils import extract_content_from_stream_response
 
@@ -53,12 +49,7 @@ def get_agent_for_model(model_name: str, agent_registry) -> Any:
             model_name,
             name=f"Agent for {model_name}",
             description=f"Agent instance for model {model_name}",
-            toolkit=[
-                execute_command,
-                read_or_search_file,
-                write_file,
-                sketch_pad_operations,
-            ],
+            toolkit=list(DEFAULT_TOOLKIT),
         )
         return agent
     except Exception as e:
@@ -230,8 +221,8 @@ async def process_agent_response(
             # 对话完成后立即持久化conversation
             try:
                 await conversation.context.persist()
-                # 直接调用sketch_pad的persist方法
-                conversation.sketch_pad.persist()
+                # sketch_pad的persist是同步文件写入，放到线程中执行，避免阻塞事件循环
+                await asyncio.to_thread(conversation.sketch_pad.persist)
                 app_log(f"✅ Auto-saved conversation {conversation.uuid} after agent response")
             except Exception as save_error:
                 # 保存失败不应该影响响应，但要记录日志
@@ -294,3 +285,91 @@ def create_chat_response(
         usage=usage,
         system_fingerprint=None,
     )
+
+
+_STREAM_END = object()
+
+
+async def coalesce_stream(
+    source: AsyncIterator[str],
+    interval: float,
+    max_chars: int = 8192,
+    max_pending: int = 256,
+) -> AsyncGenerator[str, None]:
+    """
+    合并短时间内连续产生的字符串片段后再输出，减少下游写入次数
+
+    距上次输出超过interval的片段立即输出（首包延迟不变），其余片段在窗口内累积，
+    到达窗口末尾或累计超过max_chars个字符时一次性输出。源生成器在独立任务中运行，
+    等待超时不会打断它；两者之间的队列最多缓存max_pending个片段，下游写入较慢时
+    源生成器会暂停，背压仍能传递到上游。
+
+    Args:
+        source: 字符串片段的异步迭代器（如SSE事件）
+        interval: 两次输出之间的最小间隔（秒），<=0 时逐块透传
+        max_chars: 单次输出的最大累计字符数
+        max_pending: 尚未取出的片段数上限
+
+    Yields:
+        合并后的字符串
+    """
+    if interval <= 0:
+        async for piece in source:
+            yield piece
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    async def _produce() -> None:
+        try:
+            async for piece in source:
+                await queue.put(piece)
+        finally:
+            # 被取消说明消费方已经退出，不再投递结束标记（队列已满时等待会让任务无法结束）
+            current = asyncio.current_task()
+            if current is None or not current.cancelling():
+                await queue.put(_STREAM_END)
+
+    producer = asyncio.create_task(_produce())
+    getter: Optional[asyncio.Task] = None
+    parts: List[str] = []
+    size = 0
+    last_flush = float("-inf")
+
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            if parts:
+                done, _ = await asyncio.wait({getter}, timeout=max(last_flush + interval - loop.time(), 0))
+                if not done:
+                    # 窗口结束，输出已累积的内容，继续等待同一个 get
+                    yield "".join(parts)
+                    parts.clear()
+                    size = 0
+                    last_flush = loop.time()
+                    continue
+            piece = await getter
+            getter = None
+
+            if piece is _STREAM_END:
+                break
+
+            parts.append(piece)
+            size += len(piece)
+            if size >= max_chars or loop.time() - last_flush >= interval:
+                yield "".join(parts)
+                parts.clear()
+                size = 0
+                last_flush = loop.time()
+
+        if parts:
+            yield "".join(parts)
+        # 传播源生成器中的异常
+        await producer
+    finally:
+        if getter is not None:
+            getter.cancel()
+        if not producer.done():
+            producer.cancel()